@@ -0,0 +1,360 @@
+"""
+Shared ComfyUI client, readiness probe and warm-up for the standalone test scripts
+
+Probe results are cached per server URL for a few seconds, so scripts run in
+one process (for example a single pytest session) share one /system_stats call.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from websockets.exceptions import InvalidHandshake
+from websockets.sync.client import connect as ws_connect
+
+# Prefer the C-backed orjson codec when it is installed; json_dumps returns
+# UTF-8 bytes, indented on request, and accepts NumPy scalars and arrays
+try:
+    import orjson
+    json_loads = orjson.loads
+
+    def json_dumps(obj, indent=False):
+        option = orjson.OPT_SERIALIZE_NUMPY | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, option=option)
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps(obj, indent=False):
+        return json.dumps(obj, indent=2 if indent else None, default=_numpy_value).encode('utf-8')
+
+
+def _numpy_value(value):
+    """json.dumps fallback for NumPy scalars and arrays"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+# Seconds a probe result is reused before ComfyUI is asked again
+PROBE_TTL = 10.0
+
+_probe_cache = {}
+
+# (server URL, prompt_id) -> /history entry of a prompt that has finished
+_finished_history = {}
+
+# Bounds of the /history polling interval used when no WebSocket is available
+POLL_INITIAL_DELAY = 0.1
+POLL_MAX_DELAY = 5.0
+
+# Workflow fingerprint -> output files of a run that finished successfully;
+# anchored to the repo so it does not depend on the working directory
+WORKFLOW_CACHE_FILE = Path(__file__).resolve().parent / "tests" / ".workflow_cache.json"
+
+# Directory ComfyUI resolves LoadImage and other input file names against
+COMFYUI_INPUT_DIR = Path("ComfyUI/input")
+
+# Loads the SDXL checkpoint and decodes an empty latent without sampling;
+# PreviewImage is there because ComfyUI rejects prompts with no output node
+WARMUP_WORKFLOW = {
+    "1": {
+        "inputs": {"ckpt_name": "sd_xl_base_1.0.safetensors"},
+        "class_type": "CheckpointLoaderSimple"
+    },
+    "2": {
+        "inputs": {"width": 64, "height": 64, "batch_size": 1},
+        "class_type": "EmptyLatentImage"
+    },
+    "3": {
+        "inputs": {"samples": ["2", 0], "vae": ["1", 2]},
+        "class_type": "VAEDecode"
+    },
+    "4": {
+        "inputs": {"images": ["3", 0]},
+        "class_type": "PreviewImage"
+    }
+}
+
+
+def get_system_stats(comfyui_url, session=requests, timeout=5):
+    """Return ComfyUI's /system_stats payload, or None if it is unreachable"""
+    now = time.monotonic()
+    cached = _probe_cache.get(comfyui_url)
+    if cached is not None and now - cached[0] < PROBE_TTL:
+        return cached[1]
+
+    try:
+        response = session.get(f"{comfyui_url}/system_stats", timeout=timeout)
+        stats = json_loads(response.content) if response.status_code == 200 else None
+    except (requests.RequestException, ValueError):
+        stats = None
+
+    _probe_cache[comfyui_url] = (now, stats)
+    return stats
+
+
+def prompt_outcome(event):
+    """Return (success, error_message) if a decoded event ends its prompt, else None"""
+    data = event.get("data", {})
+    if event["type"] == "execution_error":
+        return False, data.get("exception_message", "Unknown error")
+    if event["type"] == "execution_interrupted":
+        return False, "Execution interrupted"
+    # executing with node=None is ComfyUI's end-of-prompt signal
+    if event["type"] == "execution_success" or (
+        event["type"] == "executing" and data.get("node") is None
+    ):
+        return True, None
+    return None
+
+
+def wait_for_prompt(websocket, prompt_id, timeout=300, on_progress=None):
+    """Block on a sync ComfyUI WebSocket until prompt_id finishes
+
+    Returns (success, error_message). Raises TimeoutError when nothing
+    conclusive arrives within timeout seconds. on_progress, if given, is
+    called with (value, max) for each sampler progress frame.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        message = websocket.recv(timeout=max(0.0, deadline - time.monotonic()))
+        if not isinstance(message, str):
+            continue  # binary preview frame
+        event = json_loads(message)
+        data = event.get("data", {})
+        if data.get("prompt_id") != prompt_id:
+            continue
+        if event["type"] == "progress" and on_progress is not None:
+            on_progress(data["value"], data["max"])
+        outcome = prompt_outcome(event)
+        if outcome is not None:
+            return outcome
+
+
+def get_history_entry(comfyui_url, prompt_id, session=requests):
+    """Return prompt_id's /history entry, or {} while it is pending or unavailable
+
+    A pending prompt's entry is tiny; only a finished one carries the full
+    outputs payload. Finished entries never change, so they are kept and
+    that payload is downloaded once however often it is asked for.
+    """
+    key = (comfyui_url, prompt_id)
+    if key in _finished_history:
+        return _finished_history[key]
+
+    response = session.get(f"{comfyui_url}/history/{prompt_id}", timeout=10)
+    if response.status_code != 200:
+        return {}
+    entry = json_loads(response.content).get(prompt_id, {})
+    if entry.get("status", {}).get("status_str") in ("success", "error"):
+        _finished_history[key] = entry
+    return entry
+
+
+def poll_for_prompt(comfyui_url, prompt_id, session=requests, timeout=300):
+    """Poll /history until prompt_id finishes; same contract as wait_for_prompt
+
+    The interval starts at POLL_INITIAL_DELAY and grows 1.5x per poll up to
+    POLL_MAX_DELAY, so short jobs are seen quickly and long ones cost few requests.
+    """
+    deadline = time.monotonic() + timeout
+    delay = POLL_INITIAL_DELAY
+    while True:
+        status = get_history_entry(comfyui_url, prompt_id, session).get("status", {})
+        if status.get("status_str") == "success":
+            return True, None
+        if status.get("status_str") == "error":
+            for kind, data in status.get("messages", []):
+                if kind == "execution_error":
+                    return False, data.get("exception_message", "Unknown error")
+            return False, "Unknown error"
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"prompt {prompt_id} did not finish within {timeout}s")
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 1.5, POLL_MAX_DELAY)
+
+
+@contextlib.contextmanager
+def event_stream(comfyui_url, client_id):
+    """Yield a sync WebSocket carrying client_id's events, or None if it cannot be opened"""
+    ws_url = comfyui_url.replace("http", "ws", 1)
+    try:
+        websocket = ws_connect(f"{ws_url}/ws?clientId={client_id}")
+    except (OSError, InvalidHandshake) as e:
+        print(f"⚠️  WebSocket unavailable ({e}); polling /history instead")
+        yield None
+        return
+    with websocket:
+        yield websocket
+
+
+def wait_for_completion(websocket, comfyui_url, prompt_id, session=requests, timeout=300,
+                        on_progress=None):
+    """Wait on websocket when event_stream opened one, else fall back to polling
+
+    on_progress only fires on the WebSocket path; /history carries no progress.
+    """
+    if websocket is not None:
+        return wait_for_prompt(websocket, prompt_id, timeout, on_progress)
+    return poll_for_prompt(comfyui_url, prompt_id, session, timeout)
+
+
+def warm_up(comfyui_url, session=requests, timeout=300):
+    """Run WARMUP_WORKFLOW once so the first real prompt finds the checkpoint loaded
+
+    Skipped when SKIP_WARMUP=1 (for cold-start benchmarking). Returns True
+    when the warm-up prompt finished.
+    """
+    if os.environ.get("SKIP_WARMUP") == "1":
+        return False
+
+    client_id = str(uuid.uuid4())
+    ws_url = comfyui_url.replace("http", "ws", 1)
+    try:
+        with ws_connect(f"{ws_url}/ws?clientId={client_id}") as websocket:
+            response = session.post(
+                f"{comfyui_url}/prompt",
+                json={"prompt": WARMUP_WORKFLOW, "client_id": client_id},
+                timeout=30
+            )
+            response.raise_for_status()
+            prompt_id = response.json()["prompt_id"]
+
+            return wait_for_prompt(websocket, prompt_id, timeout)[0]
+    except Exception as e:
+        print(f"⚠️  Warm-up skipped: {e}")
+        return False
+
+
+def workflow_fingerprint(workflow, *input_names, input_dir=COMFYUI_INPUT_DIR):
+    """Hash a workflow together with the mtimes of the input files it reads
+
+    Names are looked up in input_dir, where ComfyUI itself resolves them,
+    falling back to the name as a path of its own.
+    """
+    digest = hashlib.blake2b(
+        json.dumps(workflow, sort_keys=True).encode("utf-8"), digest_size=16
+    )
+    for name in input_names:
+        if not name:
+            continue
+        path = os.path.join(input_dir, name)
+        if not os.path.exists(path):
+            path = name
+        if os.path.exists(path):
+            digest.update(f"{name}:{os.stat(path).st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def output_filenames(history_entry):
+    """List the saved (type "output") images in a /history entry, subfolder-relative"""
+    return [
+        os.path.join(image.get("subfolder", ""), image["filename"])
+        for node_output in history_entry.get("outputs", {}).values()
+        for image in node_output.get("images", [])
+        if image.get("type", "output") == "output"
+    ]
+
+
+def _load_workflow_cache():
+    try:
+        with open(WORKFLOW_CACHE_FILE, "rb") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def cached_outputs(fingerprint, output_dir):
+    """Return the outputs of an earlier identical run if they are all still on disk
+
+    Reuse is opt-in: unless USE_WORKFLOW_CACHE=1 is set this returns None and
+    the workflow always runs.
+    """
+    if os.environ.get("USE_WORKFLOW_CACHE") != "1":
+        return None
+    outputs = _load_workflow_cache().get(fingerprint)
+    if outputs and all(os.path.exists(os.path.join(output_dir, name)) for name in outputs):
+        return outputs
+    return None
+
+
+def remember_outputs(fingerprint, outputs):
+    """Record the outputs of a successful run under its fingerprint"""
+    if not outputs:
+        return
+    cache = _load_workflow_cache()
+    cache[fingerprint] = outputs
+    WORKFLOW_CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    WORKFLOW_CACHE_FILE.write_text(json.dumps(cache, indent=2))
+
+
+class ComfyClient:
+    """One pooled HTTP session plus WebSocket waits against a ComfyUI server"""
+
+    def __init__(self, base_url="http://127.0.0.1:8188"):
+        self.base_url = base_url
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=16,
+            max_retries=Retry(total=3, backoff_factor=0.2)
+        ))
+
+    def system_stats(self):
+        """Return the (briefly cached) /system_stats payload, or None if unreachable"""
+        return get_system_stats(self.base_url, self.session)
+
+    def queue(self, workflow, client_id, timeout=30):
+        """POST workflow to /prompt and return its prompt_id
+
+        Raises requests.HTTPError (with ComfyUI's validation message) on rejection.
+        """
+        response = self.session.post(
+            f"{self.base_url}/prompt",
+            data=json_dumps({"prompt": workflow, "client_id": client_id}),
+            headers={"Content-Type": "application/json"},
+            timeout=timeout
+        )
+        if response.status_code != 200:
+            raise requests.HTTPError(
+                f"{response.status_code} - {response.text}", response=response
+            )
+        return json_loads(response.content)["prompt_id"]
+
+    def upload_image(self, path, timeout=30):
+        """Upload an image to ComfyUI's input folder, returning its stored name"""
+        with open(path, "rb") as fp:
+            response = self.session.post(
+                f"{self.base_url}/upload/image",
+                files={"image": (os.path.basename(path), fp, "image/jpeg")},
+                timeout=timeout
+            )
+        response.raise_for_status()
+        return json_loads(response.content)["name"]
+
+    def history(self, prompt_id):
+        """Return prompt_id's /history entry, or {} if ComfyUI has none"""
+        return get_history_entry(self.base_url, prompt_id, self.session)
+
+    def run(self, workflow, timeout=300, on_progress=None):
+        """Queue workflow and block until it finishes
+
+        Returns (prompt_id, success, error_message). The event stream is opened
+        before queuing so no completion message is missed; without a WebSocket
+        this falls back to polling. Raises TimeoutError after timeout seconds.
+        """
+        client_id = str(uuid.uuid4())
+        with event_stream(self.base_url, client_id) as websocket:
+            prompt_id = self.queue(workflow, client_id)
+            success, error = wait_for_completion(
+                websocket, self.base_url, prompt_id, self.session, timeout, on_progress
+            )
+        return prompt_id, success, error
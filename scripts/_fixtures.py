@@ -0,0 +1,123 @@
+"""
+Shared test fixtures for the standalone test scripts
+
+Fixture dicts are read-only mappings, and their JSON encodings are computed
+once per process so scripts can write input files without re-serializing.
+"""
+
+import json
+from types import MappingProxyType
+
+# Sample FactsV3 data
+FACTS_V3 = MappingProxyType({
+    "garment_type": "dress",
+    "primary_color": "navy blue",
+    "primary_material": "cotton",
+    "sleeve_length": "long",
+    "neckline": "crew",
+    "fit_type": "relaxed",
+    "has_patterns": True,
+    "pattern_type": "floral",
+    "has_embellishments": False,
+    "style_category": "casual",
+    "garment_length": "midi",
+    "chest_width": "42cm",
+    "fabric_weight": "medium",
+    "color_accuracy": "high",
+    "ghost_mannequin_requirements": {
+        "interior_visibility_needed": True,
+        "volume_preservation": "high",
+        "drape_natural": True,
+        "symmetry_critical": True,
+        "edge_precision": "high"
+    },
+    "rendering_hints": {
+        "fabric_behavior": "flowing",
+        "critical_features": ["neckline", "sleeves", "drape"]
+    }
+})
+
+# Sample CCJ ControlBlock data
+CCJ_CONTROL = MappingProxyType({
+    "core_contract": {
+        "mandatory_specs": {
+            "background": {
+                "color": "#FFFFFF",
+                "type": "solid",
+                "edge_treatment": "clean alpha"
+            },
+            "silhouette": {
+                "garment_type": "dress",
+                "fit": "natural",
+                "symmetry": "bilateral"
+            },
+            "interior_rendering": {
+                "neckline_visible": True,
+                "cuff_visible": True,
+                "hem_visible": False
+            },
+            "color_accuracy": {
+                "primary_hex": "#1a237e",
+                "delta_e_max": 2.0
+            },
+            "resolution": {
+                "min_width": 2048,
+                "min_height": 2048
+            }
+        },
+        "forbidden_elements": [
+            "visible mannequin",
+            "background patterns",
+            "harsh shadows",
+            "color distortion"
+        ]
+    },
+    "rendering_hints": {
+        "lighting": {
+            "setup": "three-point studio",
+            "key_light": "soft 45-degree",
+            "shadows": "soft contact only"
+        },
+        "fabric_behavior": {
+            "material_type": "cotton",
+            "drape_weight": "natural",
+            "texture_visibility": "clear"
+        },
+        "critical_details": {
+            "preserve": ["fabric texture", "natural drape", "color accuracy"],
+            "enhance": ["garment structure", "interior visibility"],
+            "avoid": ["artificial stiffness", "color shift", "harsh edges"]
+        }
+    }
+})
+
+# Sample Light Facts data
+LIGHT_FACTS = MappingProxyType({
+    "schema_version": "3.1",
+    "analysis_mode": "light",
+    "garment": {
+        "category": "oxford dress shirt",
+        "silhouette": "tailored",
+        "fabric": "mid-weight cotton twill",
+        "finish": "matte",
+        "color_hex": "#1a237e",
+        "color_name": "navy blue",
+        "closures": "front button placket",
+        "pockets_count": 1,
+        "label_text": "Test Brand ©",
+        "special_notes": "test garment for validation"
+    },
+    "photography": {
+        "bg": "pure_white",
+        "lighting": "soft_even_high_key",
+        "frame": "4:5",
+        "coverage_pct": 85
+    },
+    "routing": {
+        "suggested_model": "sdxl"
+    }
+})
+
+FACTS_V3_BYTES = json.dumps(dict(FACTS_V3), indent=2, ensure_ascii=False).encode('utf-8')
+CCJ_CONTROL_BYTES = json.dumps(dict(CCJ_CONTROL), indent=2, ensure_ascii=False).encode('utf-8')
+LIGHT_FACTS_BYTES = json.dumps(dict(LIGHT_FACTS), indent=2).encode('utf-8')
@@ -19,94 +19,13 @@ sys.path.insert(0, str(Path(__file__).parent.parent / "custom_nodes"))
 
 from load_facts_node import LoadFactsNode
 from prompt_builder import PromptBuilder
+from _fixtures import CCJ_CONTROL_BYTES, FACTS_V3, FACTS_V3_BYTES
 
-def create_test_data():
-    """Create sample test data for testing"""
-    
-    # Sample FactsV3 data
-    test_facts = {
-        "garment_type": "dress",
-        "primary_color": "navy blue",
-        "primary_material": "cotton",
-        "sleeve_length": "long",
-        "neckline": "crew",
-        "fit_type": "relaxed",
-        "has_patterns": True,
-        "pattern_type": "floral",
-        "has_embellishments": False,
-        "style_category": "casual",
-        "garment_length": "midi",
-        "chest_width": "42cm",
-        "fabric_weight": "medium",
-        "color_accuracy": "high",
-        "ghost_mannequin_requirements": {
-            "interior_visibility_needed": True,
-            "volume_preservation": "high",
-            "drape_natural": True,
-            "symmetry_critical": True,
-            "edge_precision": "high"
-        },
-        "rendering_hints": {
-            "fabric_behavior": "flowing",
-            "critical_features": ["neckline", "sleeves", "drape"]
-        }
-    }
-    
-    # Sample CCJ ControlBlock data
-    test_ccj = {
-        "core_contract": {
-            "mandatory_specs": {
-                "background": {
-                    "color": "#FFFFFF",
-                    "type": "solid",
-                    "edge_treatment": "clean alpha"
-                },
-                "silhouette": {
-                    "garment_type": "dress",
-                    "fit": "natural",
-                    "symmetry": "bilateral"
-                },
-                "interior_rendering": {
-                    "neckline_visible": True,
-                    "cuff_visible": True,
-                    "hem_visible": False
-                },
-                "color_accuracy": {
-                    "primary_hex": "#1a237e",
-                    "delta_e_max": 2.0
-                },
-                "resolution": {
-                    "min_width": 2048,
-                    "min_height": 2048
-                }
-            },
-            "forbidden_elements": [
-                "visible mannequin",
-                "background patterns",
-                "harsh shadows",
-                "color distortion"
-            ]
-        },
-        "rendering_hints": {
-            "lighting": {
-                "setup": "three-point studio",
-                "key_light": "soft 45-degree",
-                "shadows": "soft contact only"
-            },
-            "fabric_behavior": {
-                "material_type": "cotton",
-                "drape_weight": "natural",
-                "texture_visibility": "clear"
-            },
-            "critical_details": {
-                "preserve": ["fabric texture", "natural drape", "color accuracy"],
-                "enhance": ["garment structure", "interior visibility"],
-                "avoid": ["artificial stiffness", "color shift", "harsh edges"]
-            }
-        }
-    }
-    
-    return test_facts, test_ccj
+# Sections every generated prompt must contain (system, garment, Chinese terms)
+REQUIRED_PROMPT_TOKENS = ("SYSTEM", "GARMENT", "隐形人台效果")
+
+# Number of prompt characters shown by print_sample_output
+SAMPLE_CHARS = 500
 
 def setup_test_files():
     """Create test input files"""
@@ -115,17 +34,13 @@ def setup_test_files():
     input_dir = Path("input")
     input_dir.mkdir(exist_ok=True)
     
-    test_facts, test_ccj = create_test_data()
-    
     # Write test FactsV3 file
     facts_path = input_dir / "test_factsv3.json"
-    with open(facts_path, 'w', encoding='utf-8') as f:
-        json.dump(test_facts, f, indent=2, ensure_ascii=False)
+    facts_path.write_bytes(FACTS_V3_BYTES)
     
     # Write test CCJ file
     ccj_path = input_dir / "test_ccj_controlblock.json"
-    with open(ccj_path, 'w', encoding='utf-8') as f:
-        json.dump(test_ccj, f, indent=2, ensure_ascii=False)
+    ccj_path.write_bytes(CCJ_CONTROL_BYTES)
     
     return str(facts_path), str(ccj_path)
 
@@ -143,15 +58,16 @@ def test_load_facts_node(facts_path):
     assert not description.startswith("ERROR"), f"LoadFactsNode failed: {description}"
     assert facts_json != "{}", "Facts JSON should not be empty"
     
-    # Parse facts back to verify
-    facts_dict = json.loads(facts_json)
-    assert "garment_type" in facts_dict, "Missing garment_type in facts"
+    # Check the serialized facts directly; PromptBuilder parses the string itself
+    assert '"garment_type"' in facts_json, "Missing garment_type in facts"
     
-    print(f"✅ LoadFactsNode passed!")
-    print(f"   Generated description: {description}")
-    print(f"   Facts loaded: {len(facts_dict)} fields")
+    sys.stdout.write(
+        f"✅ LoadFactsNode passed!\n"
+        f"   Generated description: {description}\n"
+        f"   Facts JSON loaded: {len(facts_json)} characters\n"
+    )
     
-    return description, facts_dict
+    return description, facts_json
 
 def test_prompt_builder(facts_description, facts_dict, ccj_path):
     """Test PromptBuilder functionality"""
@@ -171,9 +87,8 @@ def test_prompt_builder(facts_description, facts_dict, ccj_path):
     
     # Validate results
     assert "ERROR" not in final_prompt, f"PromptBuilder failed: {final_prompt}"
-    assert "SYSTEM" in final_prompt, "Missing system section"
-    assert "GARMENT" in final_prompt, "Missing garment section"
-    assert "隐形人台效果" in final_prompt, "Missing Chinese terms"
+    missing = [token for token in REQUIRED_PROMPT_TOKENS if token not in final_prompt]
+    assert not missing, f"Missing prompt sections: {missing}"
     assert "CORE CONTRACT" in core_contract, "Missing core contract header"
     assert "RENDERING HINTS" in rendering_hints, "Missing rendering hints header"
     
@@ -192,11 +107,12 @@ def test_integration():
     facts_path, ccj_path = setup_test_files()
     
     # Test LoadFactsNode
-    description, facts_dict = test_load_facts_node(facts_path)
+    description, _ = test_load_facts_node(facts_path)
     
-    # Test PromptBuilder with LoadFactsNode output
+    # Test PromptBuilder with the LoadFactsNode description; the facts are
+    # passed as the in-memory dict so they are not decoded a second time
     final_prompt, core_contract, rendering_hints = test_prompt_builder(
-        description, facts_dict, ccj_path
+        description, FACTS_V3, ccj_path
     )
     
     print(f"\n✅ Full Integration Test PASSED!")
@@ -207,22 +123,23 @@ def test_integration():
 
 def print_sample_output(final_prompt):
     """Print a sample of the generated prompt"""
-    print(f"\n" + "="*60)
-    print("📝 SAMPLE GENERATED PROMPT:")
-    print("="*60)
-    
-    # Show first 500 characters
-    sample = final_prompt[:500]
-    print(sample)
-    if len(final_prompt) > 500:
-        print(f"\n... [truncated - full length: {len(final_prompt)} characters]")
-    
-    print("="*60)
+    rule = "=" * 60
+    buf = ["", rule, "📝 SAMPLE GENERATED PROMPT:", rule]
+    
+    # Show first SAMPLE_CHARS characters, slicing only when truncation is needed
+    prompt_length = len(final_prompt)
+    if prompt_length <= SAMPLE_CHARS:
+        buf.append(final_prompt)
+    else:
+        buf.append(final_prompt[:SAMPLE_CHARS])
+        buf.append(f"\n... [truncated - full length: {prompt_length} characters]")
+    
+    buf.append(rule)
+    sys.stdout.write("\n".join(buf) + "\n")
 
 def main():
     """Run all tests"""
-    print("🚀 Starting Phase B: Custom Nodes Testing")
-    print("="*50)
+    sys.stdout.write("🚀 Starting Phase B: Custom Nodes Testing\n" + "=" * 50 + "\n")
     
     try:
         # Run integration test
@@ -231,11 +148,13 @@ def main():
         # Show sample output
         print_sample_output(final_prompt)
         
-        print(f"\n🎉 PHASE B: COMPLETE! All Tests Passed!")
-        print(f"✅ LoadFactsNode - working")
-        print(f"✅ PromptBuilder - working") 
-        print(f"✅ Integration - working")
-        print(f"✅ Ready for Phase A: ComfyUI Workflow JSON")
+        sys.stdout.write(
+            "\n🎉 PHASE B: COMPLETE! All Tests Passed!\n"
+            "✅ LoadFactsNode - working\n"
+            "✅ PromptBuilder - working\n"
+            "✅ Integration - working\n"
+            "✅ Ready for Phase A: ComfyUI Workflow JSON\n"
+        )
         
         return True
         
@@ -4,14 +4,35 @@ Comprehensive testing for ghost mannequin pipeline components
 """
 
 import os
+import importlib.util
 import json
+import re
 import sys
+import time
 import unittest
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Dict, List
-import numpy as np
-from PIL import Image
-import torch
+
+sys.path.insert(0, str(Path(__file__).parent))
+from _fixtures import LIGHT_FACTS_BYTES
+
+
+REQUIRED_GARMENT_FIELDS = frozenset((
+    "category", "silhouette", "fabric", "finish",
+    "color_hex", "color_name", "closures", "pockets_count"
+))
+
+REQUIRED_CONFIG_SECTIONS = frozenset((
+    "segmentation:", "generation:", "quality_thresholds:",
+    "inpaint:", "prompting:", "routing:"
+))
+# Single-pass scan for all required sections in the YAML config
+CONFIG_SECTION_RE = re.compile("|".join(map(re.escape, sorted(REQUIRED_CONFIG_SECTIONS))))
+
+
+# Checked without importing torch, which is slow and absent on light hosts
+TORCH_AVAILABLE = importlib.util.find_spec("torch") is not None
 
 
 class TestPhase1_5Components(unittest.TestCase):
@@ -39,10 +60,11 @@ class TestPhase1_5Components(unittest.TestCase):
     def test_light_facts_schema(self):
         """Test Light Facts schema structure"""
         schema_path = self.test_data_dir / "light_facts_schema.json"
-        self.assertTrue(schema_path.exists(), "Light Facts schema file exists")
-        
-        with open(schema_path, 'r') as f:
-            schema = json.load(f)
+        try:
+            with open(schema_path, 'r', encoding='utf-8') as f:
+                schema = json.load(f)
+        except FileNotFoundError:
+            self.fail("Light Facts schema file missing")
         
         # Check required fields
         self.assertIn("analysis_mode", schema)
@@ -52,12 +74,8 @@ class TestPhase1_5Components(unittest.TestCase):
         
         # Check garment structure
         garment = schema["garment"]
-        required_garment_fields = [
-            "category", "silhouette", "fabric", "finish",
-            "color_hex", "color_name", "closures", "pockets_count"
-        ]
-        for field in required_garment_fields:
-            self.assertIn(field, garment, f"Missing garment field: {field}")
+        missing = REQUIRED_GARMENT_FIELDS - garment.keys()
+        self.assertFalse(missing, f"Missing garment fields: {sorted(missing)}")
     
     def test_quality_gates_import(self):
         """Test quality gate nodes can be imported"""
@@ -78,10 +96,11 @@ class TestPhase1_5Components(unittest.TestCase):
         
         for workflow_file in workflow_files:
             workflow_path = self.workflows_dir / workflow_file
-            self.assertTrue(workflow_path.exists(), f"Workflow file exists: {workflow_file}")
-            
-            with open(workflow_path, 'r') as f:
-                workflow = json.load(f)
+            try:
+                with open(workflow_path, 'r', encoding='utf-8') as f:
+                    workflow = json.load(f)
+            except FileNotFoundError:
+                self.fail(f"Workflow file missing: {workflow_file}")
             
             self.assertIn("nodes", workflow, f"Workflow has nodes: {workflow_file}")
             self.assertIn("last_node_id", workflow, f"Workflow has last_node_id: {workflow_file}")
@@ -89,19 +108,16 @@ class TestPhase1_5Components(unittest.TestCase):
     def test_config_file_structure(self):
         """Test configuration file structure"""
         config_path = self.project_root / "config" / "phase1_5_params.yaml"
-        self.assertTrue(config_path.exists(), "Configuration file exists")
         
         # Basic file structure check (would need PyYAML for full validation)
-        with open(config_path, 'r') as f:
-            content = f.read()
-        
-        required_sections = [
-            "segmentation:", "generation:", "quality_thresholds:",
-            "inpaint:", "prompting:", "routing:"
-        ]
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except FileNotFoundError:
+            self.fail("Configuration file missing")
         
-        for section in required_sections:
-            self.assertIn(section, content, f"Config contains section: {section}")
+        missing = REQUIRED_CONFIG_SECTIONS - set(CONFIG_SECTION_RE.findall(content))
+        self.assertFalse(missing, f"Config missing sections: {sorted(missing)}")
     
     def test_batch_processor_import(self):
         """Test batch processor can be imported"""
@@ -228,71 +244,122 @@ class TestPhase1_5Performance(unittest.TestCase):
         """Set up performance test environment"""
         self.project_root = Path(__file__).parent.parent
     
-    def test_mask_processing_performance(self):
-        """Test mask processing utility performance"""
+    def _run_dilation(self, test_mask):
+        """Dilate test_mask with MaskDilation, returning outputs and elapsed seconds"""
         try:
             sys.path.append(str(self.project_root / "ComfyUI" / "custom_nodes"))
-            from mask_utils_node import MaskDilation, MaskToAlphaBorder, MaskStats
-            
-            # Create test mask
-            test_mask = torch.ones((1, 512, 512), dtype=torch.float32)
-            
-            # Test dilation
-            dilation_node = MaskDilation()
-            start_time = time.time()
-            processed_mask, area_ratio = dilation_node.process_mask(test_mask, 8, 3, "dilate")
-            dilation_time = time.time() - start_time
-            
-            self.assertLess(dilation_time, 1.0, "Mask dilation should complete in < 1 second")
-            self.assertIsInstance(processed_mask, torch.Tensor)
-            self.assertIsInstance(area_ratio, float)
-            
+            from mask_utils_node import MaskDilation
         except ImportError as e:
             self.skipTest(f"Mask utilities not available: {e}")
-        except NameError:
-            # time module not imported
-            import time
-            self.test_mask_processing_performance()
+        
+        dilation_node = MaskDilation()
+        start_time = time.time()
+        processed_mask, area_ratio = dilation_node.process_mask(test_mask, 8, 3, "dilate")
+        return processed_mask, area_ratio, time.time() - start_time
+    
+    @unittest.skipUnless(TORCH_AVAILABLE, "torch not installed")
+    def test_mask_processing_performance(self):
+        """Test mask processing utility on a small CPU mask"""
+        import torch
+        
+        test_mask = torch.ones((1, 64, 64), dtype=torch.float32)
+        processed_mask, area_ratio, _ = self._run_dilation(test_mask)
+        
+        self.assertIsInstance(processed_mask, torch.Tensor)
+        self.assertIsInstance(area_ratio, float)
+    
+    @unittest.skipUnless(TORCH_AVAILABLE, "torch not installed")
+    def test_mask_processing_performance_cuda(self):
+        """Test mask processing utility performance on a GPU host"""
+        import torch
+        
+        if not torch.cuda.is_available():
+            self.skipTest("CUDA required for timing threshold")
+        
+        test_mask = torch.ones((1, 512, 512), dtype=torch.float32)
+        processed_mask, area_ratio, dilation_time = self._run_dilation(test_mask)
+        
+        self.assertLess(dilation_time, 1.0, "Mask dilation should complete in < 1 second")
+        self.assertIsInstance(processed_mask, torch.Tensor)
+        self.assertIsInstance(area_ratio, float)
+
+
+TEST_CASE_CLASSES = (
+    TestPhase1_5Components,
+    TestPhase1_5Integration,
+    TestPhase1_5Performance,
+)
+
+
+def _summarize_result(result):
+    """Reduce a TestResult to picklable counts and messages"""
+    return {
+        "tests_run": result.testsRun,
+        "failures": [(str(test), traceback) for test, traceback in result.failures],
+        "errors": [(str(test), traceback) for test, traceback in result.errors],
+        "skipped": [(str(test), reason) for test, reason in result.skipped],
+    }
 
 
-def run_test_cases():
-    """Run all test cases and generate report"""
+def _run_test_case_class(test_case_class):
+    """Run a single TestCase class in a worker process"""
+    suite = unittest.TestLoader().loadTestsFromTestCase(test_case_class)
+    result = unittest.TextTestRunner(verbosity=2).run(suite)
+    return _summarize_result(result)
+
+
+def run_test_cases(jobs: int = 1):
+    """Run all test cases and generate report
+
+    With jobs > 1 each TestCase class runs as its own shard in a process
+    pool. TestPhase1_5Performance always gets a dedicated shard so its
+    timings are not skewed by GPU contention with the other classes.
+    """
     print("Running Phase 1.5 Test Suite...")
     print("=" * 50)
     
-    # Create test suite
-    loader = unittest.TestLoader()
-    suite = unittest.TestSuite()
-    
-    # Add test classes
-    suite.addTests(loader.loadTestsFromTestCase(TestPhase1_5Components))
-    suite.addTests(loader.loadTestsFromTestCase(TestPhase1_5Integration))
-    suite.addTests(loader.loadTestsFromTestCase(TestPhase1_5Performance))
+    if jobs > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            shards = list(executor.map(_run_test_case_class, TEST_CASE_CLASSES))
+    else:
+        # Create test suite
+        loader = unittest.TestLoader()
+        suite = unittest.TestSuite()
+        
+        # Add test classes
+        for test_case_class in TEST_CASE_CLASSES:
+            suite.addTests(loader.loadTestsFromTestCase(test_case_class))
+        
+        # Run tests
+        runner = unittest.TextTestRunner(verbosity=2)
+        shards = [_summarize_result(runner.run(suite))]
     
-    # Run tests
-    runner = unittest.TextTestRunner(verbosity=2)
-    result = runner.run(suite)
+    # Merge shard results
+    tests_run = sum(shard["tests_run"] for shard in shards)
+    failures = [item for shard in shards for item in shard["failures"]]
+    errors = [item for shard in shards for item in shard["errors"]]
+    skipped = [item for shard in shards for item in shard["skipped"]]
     
     # Generate summary
     print("\n" + "=" * 50)
     print("Test Summary:")
-    print(f"Tests run: {result.testsRun}")
-    print(f"Failures: {len(result.failures)}")
-    print(f"Errors: {len(result.errors)}")
-    print(f"Skipped: {len(result.skipped)}")
+    print(f"Tests run: {tests_run}")
+    print(f"Failures: {len(failures)}")
+    print(f"Errors: {len(errors)}")
+    print(f"Skipped: {len(skipped)}")
     
-    if result.failures:
+    if failures:
         print("\nFailures:")
-        for test, traceback in result.failures:
+        for test, traceback in failures:
             print(f"- {test}: {traceback}")
     
-    if result.errors:
+    if errors:
         print("\nErrors:")
-        for test, traceback in result.errors:
+        for test, traceback in errors:
             print(f"- {test}: {traceback}")
     
     # Overall result
-    success = len(result.failures) == 0 and len(result.errors) == 0
+    success = len(failures) == 0 and len(errors) == 0
     print(f"\nOverall Result: {'PASS' if success else 'FAIL'}")
     
     return success
@@ -303,49 +370,26 @@ def create_test_data():
     project_root = Path(__file__).parent.parent
     test_data_dir = project_root / "input"
     
-    # Create test Light Facts
-    test_facts = {
-        "schema_version": "3.1",
-        "analysis_mode": "light",
-        "garment": {
-            "category": "oxford dress shirt",
-            "silhouette": "tailored",
-            "fabric": "mid-weight cotton twill",
-            "finish": "matte",
-            "color_hex": "#1a237e",
-            "color_name": "navy blue",
-            "closures": "front button placket",
-            "pockets_count": 1,
-            "label_text": "Test Brand ©",
-            "special_notes": "test garment for validation"
-        },
-        "photography": {
-            "bg": "pure_white",
-            "lighting": "soft_even_high_key",
-            "frame": "4:5",
-            "coverage_pct": 85
-        },
-        "routing": {
-            "suggested_model": "sdxl"
-        }
-    }
-    
     # Save test facts
     test_facts_path = test_data_dir / "test_light_facts.json"
-    with open(test_facts_path, 'w') as f:
-        json.dump(test_facts, f, indent=2)
+    test_facts_path.write_bytes(LIGHT_FACTS_BYTES)
     
     print(f"Created test data: {test_facts_path}")
 
 
 if __name__ == "__main__":
-    import time
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Run the Phase 1.5 test suite")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Run each TestCase class in its own worker process")
+    args = parser.parse_args()
     
     # Create test data
     create_test_data()
     
     # Run tests
-    success = run_test_cases()
+    success = run_test_cases(jobs=args.jobs)
     
     # Exit with appropriate code
     sys.exit(0 if success else 1)
@@ -5,149 +5,154 @@ Test if CLIP models actually work in ComfyUI workflows
 """
 
 import requests
-import json
-import time
 import os
+from _comfyui import ComfyClient, json_dumps, json_loads
 
-def test_real_clip_workflow():
-    """Test CLIP models with a real SDXL workflow"""
-    
-    print("🧪 Real CLIP Workflow Test")
-    print("=" * 40)
-    
-    # Check if ComfyUI is running
-    try:
-        response = requests.get("http://127.0.0.1:8188/system_stats", timeout=5)
-        if response.status_code == 200:
-            print("✅ ComfyUI is running")
-        else:
-            print("❌ ComfyUI not responding")
-            return False
-    except Exception as e:
-        print(f"❌ ComfyUI not running: {e}")
-        return False
-    
-    # Create a real SDXL workflow with CLIP
-    workflow = {
-        "1": {
-            "inputs": {
-                "image": "test_garment.jpg",
-                "upload": "image"
-            },
-            "class_type": "LoadImage",
-            "_meta": {
-                "title": "Load Image"
-            }
+COMFYUI_HOST = "127.0.0.1:8188"
+
+# Shared pooled client for every ComfyUI request
+CLIENT = ComfyClient(f"http://{COMFYUI_HOST}")
+
+POSITIVE_PROMPT = "a beautiful garment, high quality, professional photography, ghost mannequin effect"
+NEGATIVE_PROMPT = "low quality, blurry, distorted, person, human, mannequin visible"
+
+# Real SDXL workflow with CLIP, built once at import and copied per call
+_WORKFLOW_TEMPLATE = {
+    "1": {
+        "inputs": {
+            "image": "test_garment.jpg",
+            "upload": "image"
         },
-        "2": {
-            "inputs": {
-                "text": "a beautiful garment, high quality, professional photography, ghost mannequin effect",
-                "clip": ["3", 0]
-            },
-            "class_type": "CLIPTextEncode",
-            "_meta": {
-                "title": "CLIP Text Encode (Prompt)"
-            }
+        "class_type": "LoadImage",
+        "_meta": {
+            "title": "Load Image"
+        }
+    },
+    "2": {
+        "inputs": {
+            "text": POSITIVE_PROMPT,
+            "clip": ["3", 0]
+        },
+        "class_type": "CLIPTextEncode",
+        "_meta": {
+            "title": "CLIP Text Encode (Prompt)"
+        }
+    },
+    "3": {
+        "inputs": {
+            "clip_name": "clip_l.safetensors",
+            "type": "stable_diffusion"
         },
-        "3": {
-            "inputs": {
-                "clip_name": "clip_l.safetensors",
-                "type": "stable_diffusion"
-            },
-            "class_type": "CLIPLoader",
-            "_meta": {
-                "title": "CLIP Loader"
-            }
+        "class_type": "CLIPLoader",
+        "_meta": {
+            "title": "CLIP Loader"
+        }
+    },
+    "4": {
+        "inputs": {
+            "text": NEGATIVE_PROMPT,
+            "clip": ["3", 0]
         },
-        "4": {
-            "inputs": {
-                "text": "low quality, blurry, distorted, person, human, mannequin visible",
-                "clip": ["3", 0]
-            },
-            "class_type": "CLIPTextEncode",
-            "_meta": {
-                "title": "CLIP Text Encode (Negative)"
-            }
+        "class_type": "CLIPTextEncode",
+        "_meta": {
+            "title": "CLIP Text Encode (Negative)"
+        }
+    },
+    "5": {
+        "inputs": {
+            "ckpt_name": "sd_xl_base_1.0.safetensors"
         },
-        "5": {
-            "inputs": {
-                "ckpt_name": "sd_xl_base_1.0.safetensors"
-            },
-            "class_type": "CheckpointLoaderSimple",
-            "_meta": {
-                "title": "Load Checkpoint"
-            }
+        "class_type": "CheckpointLoaderSimple",
+        "_meta": {
+            "title": "Load Checkpoint"
+        }
+    },
+    "6": {
+        "inputs": {
+            "text": POSITIVE_PROMPT,
+            "clip": ["5", 1]
         },
-        "6": {
-            "inputs": {
-                "text": "a beautiful garment, high quality, professional photography, ghost mannequin effect",
-                "clip": ["5", 1]
-            },
-            "class_type": "CLIPTextEncode",
-            "_meta": {
-                "title": "CLIP Text Encode (Prompt)"
-            }
+        "class_type": "CLIPTextEncode",
+        "_meta": {
+            "title": "CLIP Text Encode (Prompt)"
+        }
+    },
+    "7": {
+        "inputs": {
+            "text": NEGATIVE_PROMPT,
+            "clip": ["5", 1]
         },
-        "7": {
-            "inputs": {
-                "text": "low quality, blurry, distorted, person, human, mannequin visible",
-                "clip": ["5", 1]
-            },
-            "class_type": "CLIPTextEncode",
-            "_meta": {
-                "title": "CLIP Text Encode (Negative)"
-            }
+        "class_type": "CLIPTextEncode",
+        "_meta": {
+            "title": "CLIP Text Encode (Negative)"
+        }
+    },
+    "8": {
+        "inputs": {
+            "seed": 42,
+            "steps": 20,
+            "cfg": 7.0,
+            "sampler_name": "euler",
+            "scheduler": "normal",
+            "denoise": 1.0,
+            "model": ["5", 0],
+            "positive": ["6", 0],
+            "negative": ["7", 0],
+            "latent_image": ["9", 0]
         },
-        "8": {
-            "inputs": {
-                "seed": 42,
-                "steps": 20,
-                "cfg": 7.0,
-                "sampler_name": "euler",
-                "scheduler": "normal",
-                "denoise": 1.0,
-                "model": ["5", 0],
-                "positive": ["6", 0],
-                "negative": ["7", 0],
-                "latent_image": ["9", 0]
-            },
-            "class_type": "KSampler",
-            "_meta": {
-                "title": "KSampler"
-            }
+        "class_type": "KSampler",
+        "_meta": {
+            "title": "KSampler"
+        }
+    },
+    "9": {
+        "inputs": {
+            "width": 1024,
+            "height": 1024,
+            "batch_size": 1
         },
-        "9": {
-            "inputs": {
-                "width": 1024,
-                "height": 1024,
-                "batch_size": 1
-            },
-            "class_type": "EmptyLatentImage",
-            "_meta": {
-                "title": "Empty Latent Image"
-            }
+        "class_type": "EmptyLatentImage",
+        "_meta": {
+            "title": "Empty Latent Image"
+        }
+    },
+    "10": {
+        "inputs": {
+            "samples": ["8", 0],
+            "vae": ["5", 2]
         },
-        "10": {
-            "inputs": {
-                "samples": ["8", 0],
-                "vae": ["5", 2]
-            },
-            "class_type": "VAEDecode",
-            "_meta": {
-                "title": "VAE Decode"
-            }
+        "class_type": "VAEDecode",
+        "_meta": {
+            "title": "VAE Decode"
+        }
+    },
+    "11": {
+        "inputs": {
+            "filename_prefix": "real_clip_test",
+            "images": ["10", 0]
         },
-        "11": {
-            "inputs": {
-                "filename_prefix": "real_clip_test",
-                "images": ["10", 0]
-            },
-            "class_type": "SaveImage",
-            "_meta": {
-                "title": "Save Image"
-            }
+        "class_type": "SaveImage",
+        "_meta": {
+            "title": "Save Image"
         }
     }
+}
+
+
+def test_real_clip_workflow():
+    """Test CLIP models with a real SDXL workflow"""
+    
+    print("🧪 Real CLIP Workflow Test")
+    print("=" * 40)
+    
+    # Check if ComfyUI is running
+    if CLIENT.system_stats() is None:
+        print("❌ ComfyUI not running")
+        return False
+    print("✅ ComfyUI is running")
+    
+    # Copy the shared template so callers can patch it freely
+    workflow = json_loads(json_dumps(_WORKFLOW_TEMPLATE))
     
     print(f"✅ Created workflow with {len(workflow)} nodes")
     
@@ -159,48 +164,31 @@ def test_real_clip_workflow():
     
     print(f"✅ Found: {test_image}")
     
-    # Queue the workflow
+    # Upload the image so the LoadImage node references ComfyUI's stored copy
+    try:
+        workflow["1"]["inputs"]["image"] = CLIENT.upload_image(test_image)
+    except (OSError, requests.RequestException) as e:
+        print(f"⚠️  Could not upload {test_image}, using bundled name: {e}")
+    
+    # Queue the workflow, listening for completion on the ComfyUI event stream
     try:
         print("📤 Queuing real CLIP workflow...")
-        response = requests.post("http://127.0.0.1:8188/prompt", 
-                               json={"prompt": workflow}, 
-                               timeout=10)
-        
-        if response.status_code == 200:
-            result = response.json()
-            prompt_id = result.get("prompt_id")
-            print(f"✅ Workflow queued with ID: {prompt_id}")
-            
-            # Monitor execution
-            print("⏳ Monitoring execution...")
-            start_time = time.time()
-            
-            while time.time() - start_time < 120:  # 2 minute timeout
-                try:
-                    response = requests.get(f"http://127.0.0.1:8188/history/{prompt_id}", timeout=5)
-                    if response.status_code == 200:
-                        history = response.json()
-                        if prompt_id in history:
-                            status = history[prompt_id].get("status", {})
-                            if status.get("status_str") == "success":
-                                print("✅ Real CLIP workflow completed successfully!")
-                                return True
-                            elif status.get("status_str") == "error":
-                                print(f"❌ Real CLIP workflow failed: {status.get('message', 'Unknown error')}")
-                                return False
-                    
-                    time.sleep(3)
-                except Exception as e:
-                    print(f"⚠️  Request error: {e}")
-                    time.sleep(3)
-            
-            print("⏰ Timeout after 120 seconds")
+        print("⏳ Monitoring execution...")
+        try:
+            prompt_id, success, error = CLIENT.run(workflow, timeout=120)
+        except requests.HTTPError as e:
+            print(f"❌ Failed to queue workflow: {e}")
             return False
-            
-        else:
-            print(f"❌ Failed to queue workflow: {response.status_code}")
-            print(f"Response: {response.text}")
+        except TimeoutError:
+            print("⏰ Timeout after 120 seconds")
             return False
+        
+        print(f"✅ Workflow ran with ID: {prompt_id}")
+        if success:
+            print("✅ Real CLIP workflow completed successfully!")
+            return True
+        print(f"❌ Real CLIP workflow failed: {error}")
+        return False
             
     except Exception as e:
         print(f"❌ Error: {e}")
@@ -5,9 +5,13 @@ Test if CLIP models are working correctly
 """
 
 import requests
-import json
-import time
 import os
+from _comfyui import ComfyClient, json_loads
+
+COMFYUI_HOST = "127.0.0.1:8188"
+
+# Shared pooled client for every ComfyUI request
+CLIENT = ComfyClient(f"http://{COMFYUI_HOST}")
 
 def test_clip_models():
     """Test CLIP models with a simple workflow"""
@@ -16,16 +20,10 @@ def test_clip_models():
     print("=" * 40)
     
     # Check if ComfyUI is running
-    try:
-        response = requests.get("http://127.0.0.1:8188/system_stats", timeout=5)
-        if response.status_code == 200:
-            print("✅ ComfyUI is running")
-        else:
-            print("❌ ComfyUI not responding")
-            return False
-    except Exception as e:
-        print(f"❌ ComfyUI not running: {e}")
+    if CLIENT.system_stats() is None:
+        print("❌ ComfyUI not running")
         return False
+    print("✅ ComfyUI is running")
     
     # Load the simple CLIP test workflow
     workflow_path = "workflows/test_clip_only.json"
@@ -33,8 +31,8 @@ def test_clip_models():
         print(f"❌ Workflow not found: {workflow_path}")
         return False
     
-    with open(workflow_path, 'r') as f:
-        workflow = json.load(f)
+    with open(workflow_path, 'rb') as f:
+        workflow = json_loads(f.read())
     
     print(f"✅ Loaded workflow with {len(workflow)} nodes")
     
@@ -46,48 +44,31 @@ def test_clip_models():
     
     print(f"✅ Found: {test_image}")
     
-    # Queue the workflow
+    # Upload the image so the LoadImage node references ComfyUI's stored copy
+    try:
+        workflow["1"]["inputs"]["image"] = CLIENT.upload_image(test_image)
+    except (OSError, requests.RequestException) as e:
+        print(f"⚠️  Could not upload {test_image}, using bundled name: {e}")
+    
+    # Queue the workflow, listening for completion on the ComfyUI event stream
     try:
         print("📤 Queuing CLIP test workflow...")
-        response = requests.post("http://127.0.0.1:8188/prompt", 
-                               json={"prompt": workflow}, 
-                               timeout=10)
-        
-        if response.status_code == 200:
-            result = response.json()
-            prompt_id = result.get("prompt_id")
-            print(f"✅ Workflow queued with ID: {prompt_id}")
-            
-            # Monitor execution
-            print("⏳ Monitoring execution...")
-            start_time = time.time()
-            
-            while time.time() - start_time < 60:  # 1 minute timeout
-                try:
-                    response = requests.get(f"http://127.0.0.1:8188/history/{prompt_id}", timeout=5)
-                    if response.status_code == 200:
-                        history = response.json()
-                        if prompt_id in history:
-                            status = history[prompt_id].get("status", {})
-                            if status.get("status_str") == "success":
-                                print("✅ CLIP test completed successfully!")
-                                return True
-                            elif status.get("status_str") == "error":
-                                print(f"❌ CLIP test failed: {status.get('message', 'Unknown error')}")
-                                return False
-                    
-                    time.sleep(2)
-                except Exception as e:
-                    print(f"⚠️  Request error: {e}")
-                    time.sleep(2)
-            
-            print("⏰ Timeout after 60 seconds")
+        print("⏳ Monitoring execution...")
+        try:
+            prompt_id, success, error = CLIENT.run(workflow, timeout=60)
+        except requests.HTTPError as e:
+            print(f"❌ Failed to queue workflow: {e}")
             return False
-            
-        else:
-            print(f"❌ Failed to queue workflow: {response.status_code}")
-            print(f"Response: {response.text}")
+        except TimeoutError:
+            print("⏰ Timeout after 60 seconds")
             return False
+        
+        print(f"✅ Workflow ran with ID: {prompt_id}")
+        if success:
+            print("✅ CLIP test completed successfully!")
+            return True
+        print(f"❌ CLIP test failed: {error}")
+        return False
             
     except Exception as e:
         print(f"❌ Error: {e}")
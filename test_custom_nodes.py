@@ -8,20 +8,37 @@ import os
 sys.path.append('ComfyUI')
 sys.path.append('ComfyUI/custom_nodes')
 
-def test_import(module_name, class_name=None):
-    """Test importing a module and optionally a class"""
+EXISTING_NODES = [
+    ("load_facts_node", "LoadFactsNode"),
+    ("light_facts_prompt", "PromptFromLightFacts"),
+    ("quality_gates.edge_gate", "QualityGateEdge"),
+    ("quality_gates.bg_gate", "QualityGateBackground"),
+]
+
+NEW_NODES = [
+    ("u2net_segmentation.u2net_node", "U2NetSegmentation"),
+    ("mask_ensemble", "MaskEnsemble"),
+    ("ip_adapter_conditional", "IPAdapterConditional"),
+    ("controlnet_inpaint_polish", "ControlNetInpaintPolish"),
+]
+
+def _probe_import(module_name, class_name=None):
+    """Import a module and optionally a class, returning (ok, message)"""
     try:
         module = __import__(module_name, fromlist=[class_name] if class_name else [])
         if class_name:
             cls = getattr(module, class_name)
-            print(f"✅ {module_name}.{class_name} imported successfully")
-            return True
+            return True, f"✅ {module_name}.{class_name} imported successfully"
         else:
-            print(f"✅ {module_name} imported successfully")
-            return True
+            return True, f"✅ {module_name} imported successfully"
     except Exception as e:
-        print(f"❌ Failed to import {module_name}.{class_name if class_name else ''}: {e}")
-        return False
+        return False, f"❌ Failed to import {module_name}.{class_name if class_name else ''}: {e}"
+
+def test_import(module_name, class_name=None):
+    """Test importing a module and optionally a class"""
+    ok, message = _probe_import(module_name, class_name)
+    print(message)
+    return ok
 
 def main():
     print("🔍 Testing Custom Node Imports...")
@@ -29,17 +46,13 @@ def main():
     
     # Test existing nodes
     print("\n📦 Testing Existing Nodes:")
-    test_import("load_facts_node", "LoadFactsNode")
-    test_import("light_facts_prompt", "PromptFromLightFacts")
-    test_import("quality_gates.edge_gate", "QualityGateEdge")
-    test_import("quality_gates.bg_gate", "QualityGateBackground")
+    for module_name, class_name in EXISTING_NODES:
+        test_import(module_name, class_name)
     
     # Test new nodes
     print("\n🆕 Testing New Enhanced Nodes:")
-    test_import("u2net_segmentation.u2net_node", "U2NetSegmentation")
-    test_import("mask_ensemble", "MaskEnsemble")
-    test_import("ip_adapter_conditional", "IPAdapterConditional")
-    test_import("controlnet_inpaint_polish", "ControlNetInpaintPolish")
+    for module_name, class_name in NEW_NODES:
+        test_import(module_name, class_name)
     
     print("\n🎯 Import testing complete!")
 
@@ -3,26 +3,32 @@
 Final test script to verify all fixes work for ghost mannequin generation
 """
 import requests
-import json
-import time
+import copy
+import functools
 import os
+from _comfyui import ComfyClient, json_loads, warm_up
+
+# Shared pooled client for every ComfyUI request
+CLIENT = ComfyClient("http://localhost:8188")
+
+@functools.lru_cache(maxsize=8)
+def _load_workflow(path: str) -> dict:
+    """Parse a workflow file once; callers deepcopy it before patching"""
+    with open(path, 'rb') as f:
+        return json_loads(f.read())
 
 def test_comfyui_status():
     """Test if ComfyUI is running and accessible"""
-    try:
-        response = requests.get("http://localhost:8188/system_stats", timeout=5)
-        if response.status_code == 200:
-            stats = response.json()
-            print(f"✅ ComfyUI is running")
-            print(f"   PyTorch version: {stats['system']['pytorch_version']}")
-            print(f"   Device: {stats['devices'][0]['name']} ({stats['devices'][0]['type']})")
-            return True
-        else:
-            print(f"❌ ComfyUI returned status code: {response.status_code}")
-            return False
-    except requests.exceptions.ConnectionError:
+    stats = CLIENT.system_stats()
+    if stats is None:
         print("❌ Cannot connect to ComfyUI at http://localhost:8188")
         return False
+    
+    try:
+        print(f"✅ ComfyUI is running")
+        print(f"   PyTorch version: {stats['system']['pytorch_version']}")
+        print(f"   Device: {stats['devices'][0]['name']} ({stats['devices'][0]['type']})")
+        return True
     except Exception as e:
         print(f"❌ Error connecting to ComfyUI: {e}")
         return False
@@ -38,53 +44,26 @@ def test_ghost_workflow():
         return False
     
     try:
-        with open(workflow_path, 'r') as f:
-            workflow = json.load(f)
+        workflow = copy.deepcopy(_load_workflow(workflow_path))
         
-        # Queue the workflow
-        response = requests.post(
-            "http://localhost:8188/prompt",
-            json={"prompt": workflow},
-            timeout=300  # 5 minutes timeout
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            if "prompt_id" in result:
-                print(f"✅ Ghost mannequin workflow queued successfully")
-                print(f"   Prompt ID: {result['prompt_id']}")
-                print("   Processing... (this may take 2-3 minutes)")
-                
-                # Wait a bit and check if it's still processing
-                time.sleep(10)
-                try:
-                    history_response = requests.get(f"http://localhost:8188/history/{result['prompt_id']}")
-                    if history_response.status_code == 200:
-                        history = history_response.json()
-                        if result['prompt_id'] in history:
-                            status = history[result['prompt_id']]
-                            if 'status' in status:
-                                print(f"   Status: {status['status']}")
-                            if 'status' in status and status['status'].get('status_str') == 'success':
-                                print("🎉 Ghost mannequin generation completed successfully!")
-                                return True
-                            elif 'status' in status and status['status'].get('status_str') == 'error':
-                                print(f"❌ Generation failed: {status['status'].get('messages', 'Unknown error')}")
-                                return False
-                            else:
-                                print("   Still processing... Check ComfyUI interface for progress")
-                                return True
-                except Exception as e:
-                    print(f"   Could not check status: {e}")
-                    print("   Check ComfyUI interface for progress")
-                    return True
-            else:
-                print(f"❌ Workflow failed: {result}")
-                return False
-        else:
-            print(f"❌ HTTP error: {response.status_code}")
-            print(f"   Response: {response.text}")
+        # Queue the workflow, listening for completion on the ComfyUI event stream
+        print("   Processing... (this may take 2-3 minutes)")
+        try:
+            prompt_id, success, error = CLIENT.run(workflow, timeout=300)
+        except requests.HTTPError as e:
+            print(f"❌ HTTP error: {e}")
             return False
+        except TimeoutError:
+            print("   Still processing... Check ComfyUI interface for progress")
+            return True
+        
+        print(f"   Prompt ID: {prompt_id}")
+        
+        if success:
+            print("🎉 Ghost mannequin generation completed successfully!")
+            return True
+        print(f"❌ Generation failed: {error}")
+        return False
             
     except Exception as e:
         print(f"❌ Error testing workflow: {e}")
@@ -99,6 +78,9 @@ def main():
         print("\n❌ ComfyUI is not running. Please start it first.")
         return False
     
+    # Load the checkpoint first so the test times only generation
+    warm_up(CLIENT.base_url, CLIENT.session)
+    
     # Test 2: Ghost Workflow
     if not test_ghost_workflow():
         print("\n❌ Ghost mannequin workflow test failed.")
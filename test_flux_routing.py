@@ -4,16 +4,98 @@ Test FLUX routing in Phase 2 pipeline
 Tests that complex garments trigger FLUX model selection
 """
 
+import os
 import sys
+import functools
 import json
+import shutil
 import requests
-import time
 from pathlib import Path
 from typing import Dict, Any, Optional
+from _comfyui import ComfyClient, json_loads, warm_up
 
 
 COMFYUI_URL = "http://127.0.0.1:8188"
 WORKFLOW_FILE = "workflows/phase2_simple_no_clip.json"
+COMFYUI_INPUT_DIR = Path("ComfyUI/input")
+
+# Project trees exposed inside ComfyUI/input through directory symlinks, so
+# test inputs under them are referenced in place instead of copied per run
+INPUT_LINKS = {
+    "data": Path("data/input"),
+    "facts": Path("facts")
+}
+
+# Shared pooled client for every ComfyUI request
+CLIENT = ComfyClient(COMFYUI_URL)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_workflow(path: str) -> dict:
+    """Parse a workflow file once; callers copy before patching"""
+    with open(path, 'rb') as f:
+        return json_loads(f.read())
+
+
+class WorkflowTemplate:
+    """Cached workflow whose image and facts inputs live on fixed node IDs"""
+    
+    def __init__(self, path: str, image_node: str = "1", facts_node: str = "3"):
+        self.base = _load_workflow(path)
+        self.image_node = image_node
+        self.facts_node = facts_node
+    
+    def render(self, image_name: str, facts_name: str) -> dict:
+        """Return a workflow with the given inputs
+        
+        Only the two patched nodes are copied; all other nodes are shared
+        with the cached template, which is never mutated.
+        """
+        workflow = dict(self.base)
+        for node_id, key, value in ((self.image_node, "image", image_name),
+                                    (self.facts_node, "facts_file_path", facts_name)):
+            node = workflow[node_id] = dict(workflow[node_id])
+            node["inputs"] = {**node["inputs"], key: value}
+        return workflow
+
+
+def _input_name(src: Path) -> str:
+    """Return the ComfyUI/input-relative name for src, linking or copying it in"""
+    src = src.resolve()
+    for link_name, target in INPUT_LINKS.items():
+        target = target.resolve()
+        if not src.is_relative_to(target):
+            continue
+        link = COMFYUI_INPUT_DIR / link_name
+        try:
+            link.symlink_to(target, target_is_directory=True)
+        except FileExistsError:
+            pass  # already linked, possibly by a concurrent run; checked below
+        if link.resolve() == target:
+            return (Path(link_name) / src.relative_to(target)).as_posix()
+    
+    # Outside the linked trees (or the link name is taken): copy it in
+    _fast_copy(src, COMFYUI_INPUT_DIR / src.name)
+    return src.name
+
+
+def _fast_copy(src: Path, dst: Path) -> None:
+    """Place src at dst, hardlinking when both are on the same filesystem
+    
+    Nothing is done when dst is already src or an up-to-date copy of it.
+    """
+    if dst.exists():
+        src_stat, dst_stat = src.stat(), dst.stat()
+        if os.path.samestat(src_stat, dst_stat) or (
+            dst_stat.st_size == src_stat.st_size and dst_stat.st_mtime >= src_stat.st_mtime
+        ):
+            return
+        dst.unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Cross-device: copyfile uses the kernel's sendfile fast path on Linux
+        shutil.copyfile(src, dst)
 
 
 def test_flux_routing(test_image: str, facts_file: str, timeout: int = 600) -> Optional[Dict[str, Any]]:
@@ -33,8 +115,7 @@ def test_flux_routing(test_image: str, facts_file: str, timeout: int = 600) -> O
     
     # Load workflow
     try:
-        with open(WORKFLOW_FILE) as f:
-            workflow = json.load(f)
+        template = WorkflowTemplate(WORKFLOW_FILE)
     except FileNotFoundError:
         print(f"❌ Error: Workflow file {WORKFLOW_FILE} not found")
         return None
@@ -44,91 +125,50 @@ def test_flux_routing(test_image: str, facts_file: str, timeout: int = 600) -> O
     
     # Update LoadImage node with test image
     if not test_image.startswith("ComfyUI/input/"):
-        import shutil
-        src_path = Path(test_image)
-        dst_path = Path("ComfyUI/input") / src_path.name
-        shutil.copy2(src_path, dst_path)
-        workflow["1"]["inputs"]["image"] = src_path.name
-        print(f"Copied {test_image} to ComfyUI/input/ and updated workflow")
+        image_name = _input_name(Path(test_image))
+        print(f"Placed {test_image} in ComfyUI/input/ as {image_name} and updated workflow")
     else:
-        workflow["1"]["inputs"]["image"] = test_image
+        image_name = test_image
         print(f"Updated LoadImage node (ID 1) to use: {test_image}")
     
     # Update LoadFactsNode with facts file (node 3 in simple workflow)
     facts_path = Path(facts_file)
     if facts_path.exists():
-        # Copy facts to ComfyUI input directory
-        dst_facts = Path("ComfyUI/input") / facts_path.name
-        import shutil
-        shutil.copy2(facts_path, dst_facts)
-        workflow["3"]["inputs"]["facts_file_path"] = facts_path.name
-        print(f"Updated LoadFactsNode (ID 3) to use: {facts_path.name}")
+        # Expose facts in the ComfyUI input directory
+        facts_name = _input_name(facts_path)
+        print(f"Updated LoadFactsNode (ID 3) to use: {facts_name}")
     else:
         print(f"❌ Facts file not found: {facts_file}")
         return None
     
-    # Queue prompt
+    workflow = template.render(image_name, facts_name)
+    
+    # Queue prompt, listening for completion on the ComfyUI event stream
     try:
         print(f"📤 Queuing workflow to ComfyUI...")
-        response = requests.post(f"{COMFYUI_URL}/prompt", json={"prompt": workflow}, timeout=30)
-        
-        if response.status_code != 200:
-            print(f"❌ Failed to queue prompt: {response.status_code} - {response.text}")
+        print(f"⏳ Waiting for workflow completion (timeout: {timeout}s)...")
+        try:
+            prompt_id, success, error = CLIENT.run(workflow, timeout)
+        except requests.HTTPError as e:
+            print(f"❌ Failed to queue prompt: {e}")
             return None
-        
-        result = response.json()
-        prompt_id = result.get("prompt_id")
-        
-        if not prompt_id:
-            print(f"❌ No prompt ID returned: {result}")
+        except TimeoutError:
+            print(f"⏰ Timeout reached ({timeout}s)")
             return None
         
-        print(f"✅ Workflow queued successfully (ID: {prompt_id})")
+        if not success:
+            print(f"❌ Workflow failed: {error}")
+            return None
         
-        # Wait for completion
-        print(f"⏳ Waiting for workflow completion (timeout: {timeout}s)...")
-        start_time = time.time()
+        # The finished prompt's outputs; its status is terminal by now
+        prompt_data = CLIENT.history(prompt_id)
+        status = prompt_data.get("status", {})
+        if status.get("status_str") != "success":
+            print(f"❌ Workflow failed: {status.get('messages', 'Unknown error')}")
+            return None
         
-        while time.time() - start_time < timeout:
-            try:
-                # Check prompt status
-                status_response = requests.get(f"{COMFYUI_URL}/history/{prompt_id}")
-                if status_response.status_code == 200:
-                    history = status_response.json()
-                    
-                    if prompt_id in history:
-                        prompt_data = history[prompt_id]
-                        
-                        if "status" in prompt_data:
-                            status = prompt_data["status"]
-                            
-                            if status.get("status_str") == "success":
-                                print(f"✅ Workflow completed successfully!")
-                                return prompt_data
-                            elif status.get("status_str") == "error":
-                                print(f"❌ Workflow failed: {status.get('error', 'Unknown error')}")
-                                return None
-                
-                # Check if images are available
-                queue_response = requests.get(f"{COMFYUI_URL}/queue")
-                if queue_response.status_code == 200:
-                    queue_data = queue_response.json()
-                    if not queue_data.get("queue_running") and not queue_data.get("queue_pending"):
-                        # Queue is empty, check for results
-                        if prompt_id in history:
-                            prompt_data = history[prompt_id]
-                            if "outputs" in prompt_data:
-                                print(f"✅ Workflow completed!")
-                                return prompt_data
-                
-                time.sleep(5)  # Check every 5 seconds
-                
-            except requests.RequestException as e:
-                print(f"⚠️  Request error while waiting: {e}")
-                time.sleep(5)
-        
-        print(f"⏰ Timeout reached ({timeout}s)")
-        return None
+        print(f"✅ Workflow {prompt_id} completed successfully!")
+        return prompt_data
         
     except requests.RequestException as e:
         print(f"❌ Network error: {e}")
@@ -140,11 +180,7 @@ def test_flux_routing(test_image: str, facts_file: str, timeout: int = 600) -> O
 
 def check_comfyui_status() -> bool:
     """Check if ComfyUI is running and accessible"""
-    try:
-        response = requests.get(f"{COMFYUI_URL}/system_stats", timeout=5)
-        return response.status_code == 200
-    except:
-        return False
+    return CLIENT.system_stats() is not None
 
 
 def main():
@@ -161,6 +197,9 @@ def main():
     
     print("✅ ComfyUI is running and accessible")
     
+    # Load the checkpoint first so the test times only generation
+    warm_up(COMFYUI_URL, CLIENT.session)
+    
     # Use the same test image as before
     test_image = "data/input/real/test_garment_001.jpg"
     facts_file = "facts/cache/test_flux_routing_facts.json"
@@ -4,11 +4,16 @@ Test real Gemini part analysis with actual API calls
 """
 
 import os
+import hashlib
 import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 from pathlib import Path
 from dotenv import load_dotenv
 import google.generativeai as genai
 from PIL import Image
+from _comfyui import json_dumps, json_loads
 
 # Load environment variables
 load_dotenv()
@@ -36,6 +41,84 @@ Identify (JSON only):
 }}
 """
 
+# Parsed part analyses keyed by image, part and garment category
+PART_CACHE_FILE = "facts/cache/gemini_part_cache.json"
+
+# First {...} span in a response, dropping any markdown code fences
+JSON_OBJECT_RE = re.compile(r'\{.*\}', re.S)
+
+def load_part_cache():
+    """Load the part-analysis cache, or an empty one if missing or corrupt"""
+    try:
+        with open(PART_CACHE_FILE, 'rb') as f:
+            return json_loads(f.read())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_part_cache(cache):
+    """Persist the part-analysis cache"""
+    Path(PART_CACHE_FILE).parent.mkdir(parents=True, exist_ok=True)
+    with open(PART_CACHE_FILE, 'wb') as f:
+        f.write(json_dumps(cache, indent=True))
+
+def analyze_part(model, image_part, part_name, garment_category, cache):
+    """Analyze one garment part with Gemini, or return None on API error
+    
+    Successful parses are stored in cache, so a repeat run with the same
+    image, model and prompt skips the API call.
+    """
+    print(f"\n🔬 Analyzing {part_name}...")
+    
+    prompt = PART_PROMPT_TEMPLATE.format(
+        part_name=part_name,
+        garment_category=garment_category
+    )
+    
+    # Key on everything that shapes the answer, so a new model or an edited
+    # prompt misses the cache instead of returning a stale analysis
+    key = hashlib.sha256(
+        image_part["data"] + model.model_name.encode() + b"\0" + prompt.encode()
+    ).hexdigest()
+    
+    if key in cache:
+        print(f"♻️  Using cached analysis for {part_name}")
+        payload = cache[key]
+    else:
+        try:
+            response = model.generate_content([prompt, image_part])
+            print(f"✅ Gemini response: {response.text[:100]}...")
+        except Exception as e:
+            print(f"❌ Error analyzing {part_name}: {e}")
+            return None
+        
+        # Try to parse as JSON (handle markdown code blocks)
+        try:
+            match = JSON_OBJECT_RE.search(response.text)
+            payload = json_loads(match.group(0) if match else response.text)
+        except json.JSONDecodeError as e:
+            print(f"⚠️  Could not parse JSON for {part_name}, using fallback")
+            # Create fallback data
+            return {
+                "part_name": part_name,
+                "color_hex": "#FFFFFF",
+                "texture": "woven",
+                "pattern": "solid",
+                "condition": "clean",
+                "seam_quality": 0.8,
+                "sharpness_needed": 0.7,
+                "transparency": 0.0,
+                "analyzed": True,
+                "analysis_method": "gemini-fallback"
+            }
+        cache[key] = payload
+    
+    part_data = dict(payload)
+    part_data["part_name"] = part_name
+    part_data["analyzed"] = True
+    part_data["analysis_method"] = "gemini-2.5-flash-lite"
+    print(f"✅ Parsed JSON successfully for {part_name}: {part_data}")
+    return part_data
+
 def test_gemini_part_analysis():
     """Test Gemini part analysis with a real image"""
     
@@ -51,9 +134,24 @@ def test_gemini_part_analysis():
     try:
         model = genai.GenerativeModel('gemini-2.5-flash-lite')
         
-        # Load the image
-        image = Image.open(test_image_path)
-        print(f"📷 Loaded image: {image.size} pixels")
+        # Load the image (Image.open only reads the header here)
+        with Image.open(test_image_path) as image:
+            print(f"📷 Loaded image: {image.size} pixels")
+            
+            if image.format == "JPEG" and image.mode in ("RGB", "L") and max(image.size) <= 1024:
+                # Already a small JPEG: send the file bytes without decoding
+                image_bytes = Path(test_image_path).read_bytes()
+            else:
+                # Gemini downsamples large inputs anyway, so shrink and
+                # JPEG-encode the image once
+                rgb = image.convert("RGB")
+                rgb.thumbnail((1024, 1024), Image.LANCZOS)
+                buf = BytesIO()
+                rgb.save(buf, "JPEG", quality=85, optimize=True)
+                image_bytes = buf.getvalue()
+        
+        # The same payload is sent for every part
+        image_part = {"mime_type": "image/jpeg", "data": image_bytes}
         
         # Test analysis for different parts
         parts_to_test = [
@@ -62,56 +160,15 @@ def test_gemini_part_analysis():
             ("sleeve", "dress_shirt")
         ]
         
-        results = []
-        
-        for part_name, garment_category in parts_to_test:
-            print(f"\n🔬 Analyzing {part_name}...")
-            
-            prompt = PART_PROMPT_TEMPLATE.format(
-                part_name=part_name,
-                garment_category=garment_category
+        # Parts are independent API round-trips, so analyze them concurrently
+        # against the shared model; cached parts skip the call entirely
+        cache = load_part_cache()
+        with ThreadPoolExecutor(max_workers=len(parts_to_test)) as executor:
+            analyses = executor.map(
+                lambda spec: analyze_part(model, image_part, *spec, cache), parts_to_test
             )
-            
-            try:
-                response = model.generate_content([prompt, image])
-                print(f"✅ Gemini response: {response.text[:100]}...")
-                
-                # Try to parse as JSON (handle markdown code blocks)
-                try:
-                    # Clean the response text (remove markdown code blocks)
-                    clean_text = response.text.strip()
-                    if clean_text.startswith('```json'):
-                        clean_text = clean_text[7:]  # Remove ```json
-                    if clean_text.endswith('```'):
-                        clean_text = clean_text[:-3]  # Remove ```
-                    clean_text = clean_text.strip()
-                    
-                    part_data = json.loads(clean_text)
-                    part_data["part_name"] = part_name
-                    part_data["analyzed"] = True
-                    part_data["analysis_method"] = "gemini-2.5-flash-lite"
-                    results.append(part_data)
-                    print(f"✅ Parsed JSON successfully for {part_name}: {part_data}")
-                except json.JSONDecodeError as e:
-                    print(f"⚠️  Could not parse JSON for {part_name}, using fallback")
-                    # Create fallback data
-                    fallback_data = {
-                        "part_name": part_name,
-                        "color_hex": "#FFFFFF",
-                        "texture": "woven",
-                        "pattern": "solid",
-                        "condition": "clean",
-                        "seam_quality": 0.8,
-                        "sharpness_needed": 0.7,
-                        "transparency": 0.0,
-                        "analyzed": True,
-                        "analysis_method": "gemini-fallback"
-                    }
-                    results.append(fallback_data)
-                    
-            except Exception as e:
-                print(f"❌ Error analyzing {part_name}: {e}")
-                continue
+            results = [part_data for part_data in analyses if part_data is not None]
+        save_part_cache(cache)
         
         # Create Facts V3.1 structure
         facts_v3_1 = {
@@ -146,8 +203,8 @@ def test_gemini_part_analysis():
         output_file = "facts/cache/test_gemini_real_analysis.json"
         Path(output_file).parent.mkdir(parents=True, exist_ok=True)
         
-        with open(output_file, 'w') as f:
-            json.dump(facts_v3_1, f, indent=2)
+        with open(output_file, 'wb') as f:
+            f.write(json_dumps(facts_v3_1, indent=True))
         
         print(f"\n✅ Real Gemini analysis completed!")
         print(f"📄 Results saved to: {output_file}")
@@ -5,28 +5,28 @@ Simple script to test the Phase 1.5 pipeline via ComfyUI API
 """
 
 import requests
-import json
-import time
-import os
+import copy
+import functools
 from pathlib import Path
+from _comfyui import ComfyClient, json_loads, warm_up
+
+# Shared pooled client for every ComfyUI request
+CLIENT = ComfyClient("http://localhost:8188")
+
+@functools.lru_cache(maxsize=8)
+def _load_workflow(path: str) -> dict:
+    """Parse a workflow file once; callers deepcopy it before patching"""
+    with open(path, 'rb') as f:
+        return json_loads(f.read())
 
 def test_ghost_mannequin():
     """Test the ghost mannequin generation pipeline"""
     
-    # ComfyUI server URL
-    comfyui_url = "http://localhost:8188"
-    
     # Check if ComfyUI is running
-    try:
-        response = requests.get(f"{comfyui_url}/system_stats")
-        if response.status_code == 200:
-            print("✅ ComfyUI is running")
-        else:
-            print("❌ ComfyUI is not responding")
-            return False
-    except Exception as e:
-        print(f"❌ Cannot connect to ComfyUI: {e}")
+    if CLIENT.system_stats() is None:
+        print("❌ Cannot connect to ComfyUI")
         return False
+    print("✅ ComfyUI is running")
     
     # Load the complete workflow
     workflow_path = Path("workflows/phase1_5_complete.json")
@@ -34,8 +34,7 @@ def test_ghost_mannequin():
         print(f"❌ Workflow file not found: {workflow_path}")
         return False
     
-    with open(workflow_path, 'r') as f:
-        workflow = json.load(f)
+    workflow = copy.deepcopy(_load_workflow(str(workflow_path)))
     
     print("✅ Loaded Phase 1.5 complete workflow")
     
@@ -50,66 +49,30 @@ def test_ghost_mannequin():
     
     print("✅ Configured workflow with test inputs")
     
-    # Queue the workflow
+    # Queue the workflow, listening for completion on the ComfyUI event stream
+    print("\n🔄 Monitoring progress...")
+    print("You can also watch progress in ComfyUI at: http://localhost:8188")
     try:
-        response = requests.post(
-            f"{comfyui_url}/prompt",
-            json={"prompt": workflow}
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            prompt_id = result.get("prompt_id")
-            print(f"✅ Workflow queued successfully! Prompt ID: {prompt_id}")
-            
-            # Monitor progress
-            print("\n🔄 Monitoring progress...")
-            print("You can also watch progress in ComfyUI at: http://localhost:8188")
-            
-            # Check status periodically
-            for i in range(30):  # Check for up to 5 minutes
-                time.sleep(10)
-                
-                # Get queue status
-                queue_response = requests.get(f"{comfyui_url}/queue")
-                if queue_response.status_code == 200:
-                    queue_data = queue_response.json()
-                    
-                    # Check if completed
-                    running = queue_data.get("queue_running", [])
-                    pending = queue_data.get("queue_pending", [])
-                    
-                    if not running and not pending:
-                        print("✅ Processing completed!")
-                        
-                        # Get history
-                        history_response = requests.get(f"{comfyui_url}/history/{prompt_id}")
-                        if history_response.status_code == 200:
-                            history = history_response.json()
-                            if prompt_id in history:
-                                status = history[prompt_id].get("status", {})
-                                if status.get("status") == "success":
-                                    print("🎉 Ghost mannequin generated successfully!")
-                                    print("📁 Check the output directory for results")
-                                    return True
-                                else:
-                                    print(f"❌ Generation failed: {status.get('message', 'Unknown error')}")
-                                    return False
-                        break
-                    else:
-                        print(f"⏳ Still processing... ({i+1}/30)")
-            
-            print("⏰ Processing is taking longer than expected")
-            print("Check ComfyUI interface for detailed progress")
-            return True
-            
-        else:
-            print(f"❌ Failed to queue workflow: {response.text}")
-            return False
-            
+        prompt_id, success, error = CLIENT.run(workflow, timeout=300)  # 5 minutes
+    except requests.HTTPError as e:
+        print(f"❌ Failed to queue workflow: {e}")
+        return False
+    except TimeoutError:
+        print("⏰ Processing is taking longer than expected")
+        print("Check ComfyUI interface for detailed progress")
+        return True
     except Exception as e:
         print(f"❌ Error during workflow execution: {e}")
         return False
+    
+    print(f"✅ Workflow ran! Prompt ID: {prompt_id}")
+    if success:
+        print("✅ Processing completed!")
+        print("🎉 Ghost mannequin generated successfully!")
+        print("📁 Check the output directory for results")
+        return True
+    print(f"❌ Generation failed: {error}")
+    return False
 
 def main():
     """Main function"""
@@ -121,6 +84,9 @@ def main():
         print("❌ Please run this script from the project root directory")
         return
     
+    # Load the checkpoint first so the test times only generation
+    warm_up(CLIENT.base_url, CLIENT.session)
+    
     # Run the test
     success = test_ghost_mannequin()
     
@@ -2,27 +2,45 @@
 """
 Test script to verify the torch.compiler fix works
 """
-import requests
-import json
 import time
 import os
+from _comfyui import ComfyClient, json_dumps, json_loads
+
+# Shared pooled client for every ComfyUI request
+CLIENT = ComfyClient("http://localhost:8188")
+
+# Simple workflow that just loads a checkpoint and encodes text
+SIMPLE_WORKFLOW = {
+    "1": {
+        "inputs": {
+            "ckpt_name": "sd_xl_base_1.0.safetensors"
+        },
+        "class_type": "CheckpointLoaderSimple"
+    },
+    "2": {
+        "inputs": {
+            "text": "test prompt",
+            "clip": ["1", 1]
+        },
+        "class_type": "CLIPTextEncode"
+    }
+}
+
+# The payload never changes, so it is serialized once at import
+_SIMPLE_PAYLOAD = json_dumps({"prompt": SIMPLE_WORKFLOW})
 
 def test_comfyui_connection():
     """Test if ComfyUI is running and accessible"""
-    try:
-        response = requests.get("http://localhost:8188/system_stats", timeout=5)
-        if response.status_code == 200:
-            stats = response.json()
-            print(f"✅ ComfyUI is running")
-            print(f"   PyTorch version: {stats['system']['pytorch_version']}")
-            print(f"   ComfyUI version: {stats['system']['comfyui_version']}")
-            return True
-        else:
-            print(f"❌ ComfyUI returned status code: {response.status_code}")
-            return False
-    except requests.exceptions.ConnectionError:
+    stats = CLIENT.system_stats()
+    if stats is None:
         print("❌ Cannot connect to ComfyUI at http://localhost:8188")
         return False
+    
+    try:
+        print(f"✅ ComfyUI is running")
+        print(f"   PyTorch version: {stats['system']['pytorch_version']}")
+        print(f"   ComfyUI version: {stats['system']['comfyui_version']}")
+        return True
     except Exception as e:
         print(f"❌ Error connecting to ComfyUI: {e}")
         return False
@@ -31,33 +49,17 @@ def test_simple_workflow():
     """Test a simple workflow to verify torch.compiler fix"""
     print("\n🧪 Testing simple workflow...")
     
-    # Simple workflow that just loads a checkpoint and encodes text
-    simple_workflow = {
-        "1": {
-            "inputs": {
-                "ckpt_name": "sd_xl_base_1.0.safetensors"
-            },
-            "class_type": "CheckpointLoaderSimple"
-        },
-        "2": {
-            "inputs": {
-                "text": "test prompt",
-                "clip": ["1", 1]
-            },
-            "class_type": "CLIPTextEncode"
-        }
-    }
-    
     try:
         # Queue the simple workflow
-        response = requests.post(
-            "http://localhost:8188/prompt",
-            json={"prompt": simple_workflow},
+        response = CLIENT.session.post(
+            f"{CLIENT.base_url}/prompt",
+            data=_SIMPLE_PAYLOAD,
+            headers={"Content-Type": "application/json"},
             timeout=30
         )
         
         if response.status_code == 200:
-            result = response.json()
+            result = json_loads(response.content)
             if "prompt_id" in result:
                 print(f"✅ Simple workflow queued successfully")
                 print(f"   Prompt ID: {result['prompt_id']}")
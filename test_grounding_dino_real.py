@@ -6,7 +6,10 @@ Tests the actual GroundingDINO model with garment part detection
 
 import sys
 import os
+import io
 import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
 import numpy as np
 
@@ -14,6 +17,13 @@ import numpy as np
 sys.path.append('ComfyUI')
 sys.path.append('ComfyUI/custom_nodes')
 
+def _stat_mb(path):
+    """Return the size of path in MB from a single stat, or None if it is missing"""
+    try:
+        return os.stat(path).st_size / (1024*1024)
+    except FileNotFoundError:
+        return None
+
 def test_grounding_dino_integration():
     """Test real GroundingDINO integration"""
     print("🧪 Testing Real GroundingDINO Integration...")
@@ -88,8 +98,8 @@ def test_sam2_integration():
     try:
         # Check if SAM2 model exists
         sam2_path = "ComfyUI/models/sam2/sam2_hiera_base_plus.pt"
-        if os.path.exists(sam2_path):
-            size = os.path.getsize(sam2_path) / (1024*1024)  # MB
+        size = _stat_mb(sam2_path)
+        if size is not None:
             print(f"✅ SAM2 model found: {size:.1f}MB")
             return True
         else:
@@ -107,8 +117,8 @@ def test_ip_adapter_integration():
     try:
         # Check if IP-Adapter model exists
         ipadapter_path = "ComfyUI/models/ipadapter/ip-adapter_sdxl_vit-h.safetensors"
-        if os.path.exists(ipadapter_path):
-            size = os.path.getsize(ipadapter_path) / (1024*1024)  # MB
+        size = _stat_mb(ipadapter_path)
+        if size is not None:
             print(f"✅ IP-Adapter model found: {size:.1f}MB")
             return True
         else:
@@ -126,9 +136,9 @@ def test_sdxl_integration():
     try:
         # Check if SDXL model exists
         sdxl_path = "ComfyUI/models/checkpoints/sd_xl_base_1.0.safetensors"
-        if os.path.exists(sdxl_path):
-            size = os.path.getsize(sdxl_path) / (1024*1024*1024)  # GB
-            print(f"✅ SDXL model found: {size:.1f}GB")
+        size = _stat_mb(sdxl_path)
+        if size is not None:
+            print(f"✅ SDXL model found: {size / 1024:.1f}GB")
             return True
         else:
             print(f"❌ SDXL model not found: {sdxl_path}")
@@ -138,18 +148,58 @@ def test_sdxl_integration():
         print(f"❌ SDXL test failed: {e}")
         return False
 
+_thread_output = threading.local()
+
+class _PerThreadStdout:
+    """sys.stdout stand-in that sends a worker thread's prints to its own buffer"""
+    
+    def __init__(self, stream):
+        self._stream = stream
+    
+    def write(self, text):
+        return getattr(_thread_output, "buffer", self._stream).write(text)
+    
+    def flush(self):
+        self._stream.flush()
+    
+    def __getattr__(self, name):
+        # Anything else (encoding, isatty, fileno, ...) comes from the real stream
+        return getattr(self._stream, name)
+
+def _run_buffered(check):
+    """Run one component check, returning (passed, captured_output)"""
+    _thread_output.buffer = io.StringIO()
+    try:
+        return check(), _thread_output.buffer.getvalue()
+    finally:
+        del _thread_output.buffer
+
 def main():
     """Run all integration tests"""
     print("🚀 Phase 2 Component Integration Tests")
     print("=" * 50)
     
+    checks = {
+        'grounding_dino': test_grounding_dino_integration,
+        'sam2': test_sam2_integration,
+        'ip_adapter': test_ip_adapter_integration,
+        'sdxl': test_sdxl_integration
+    }
     results = {}
     
-    # Test each component
-    results['grounding_dino'] = test_grounding_dino_integration()
-    results['sam2'] = test_sam2_integration()
-    results['ip_adapter'] = test_ip_adapter_integration()
-    results['sdxl'] = test_sdxl_integration()
+    # The checks are independent, so run them concurrently and print each
+    # one's buffered log in order once it is done
+    real_stdout = sys.stdout
+    sys.stdout = _PerThreadStdout(real_stdout)
+    try:
+        with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+            futures = {name: executor.submit(_run_buffered, check)
+                       for name, check in checks.items()}
+            for name, future in futures.items():
+                results[name], output = future.result()
+                real_stdout.write(output)
+    finally:
+        sys.stdout = real_stdout
     
     # Summary
     print("\n📊 Integration Test Results:")
@@ -15,6 +15,9 @@ from typing import Dict, Any, Optional
 COMFYUI_URL = "http://127.0.0.1:8188"
 WORKFLOW_FILE = "workflows/phase2_simple_no_clip.json"
 
+# History polls without an entry before /queue is checked for the prompt
+QUEUE_CHECK_TICKS = 6
+
 
 def test_ipadapter_integration(test_image: str, facts_file: str, timeout: int = 600) -> Optional[Dict[str, Any]]:
     """
@@ -89,37 +92,36 @@ def test_ipadapter_integration(test_image: str, facts_file: str, timeout: int =
         print(f"⏳ Waiting for workflow completion (timeout: {timeout}s)...")
         start_time = time.time()
         
+        # Poll /history only; /queue is read every QUEUE_CHECK_TICKS ticks
+        # while the prompt has no history entry, to catch a dropped prompt
+        missing_ticks = 0
         while time.time() - start_time < timeout:
             try:
                 # Check prompt status
                 status_response = requests.get(f"{COMFYUI_URL}/history/{prompt_id}")
-                if status_response.status_code == 200:
-                    history = status_response.json()
-                    
-                    if prompt_id in history:
-                        prompt_data = history[prompt_id]
-                        
-                        if "status" in prompt_data:
-                            status = prompt_data["status"]
-                            
-                            if status.get("status_str") == "success":
-                                print(f"✅ Workflow completed successfully!")
-                                return prompt_data
-                            elif status.get("status_str") == "error":
-                                print(f"❌ Workflow failed: {status.get('error', 'Unknown error')}")
-                                return None
+                history = status_response.json() if status_response.status_code == 200 else {}
+                prompt_data = history.get(prompt_id)
                 
-                # Check if images are available
-                queue_response = requests.get(f"{COMFYUI_URL}/queue")
-                if queue_response.status_code == 200:
-                    queue_data = queue_response.json()
-                    if not queue_data.get("queue_running") and not queue_data.get("queue_pending"):
-                        # Queue is empty, check for results
-                        if prompt_id in history:
-                            prompt_data = history[prompt_id]
-                            if "outputs" in prompt_data:
-                                print(f"✅ Workflow completed!")
-                                return prompt_data
+                if prompt_data is not None:
+                    status_str = prompt_data.get("status", {}).get("status_str")
+                    if status_str == "success":
+                        print(f"✅ Workflow completed successfully!")
+                        return prompt_data
+                    elif status_str == "error":
+                        print(f"❌ Workflow failed: {prompt_data['status'].get('error', 'Unknown error')}")
+                        return None
+                else:
+                    missing_ticks += 1
+                    if missing_ticks % QUEUE_CHECK_TICKS == 0:
+                        queue_data = requests.get(f"{COMFYUI_URL}/queue").json()
+                        queued = queue_data.get("queue_running", []) + queue_data.get("queue_pending", [])
+                        if not any(item[1] == prompt_id for item in queued):
+                            # Re-read history in case it finished between the two calls
+                            history = requests.get(f"{COMFYUI_URL}/history/{prompt_id}").json()
+                            if prompt_id not in history:
+                                print(f"❌ Prompt {prompt_id} is neither queued nor in history")
+                                return None
+                            continue
                 
                 time.sleep(5)  # Check every 5 seconds
                 
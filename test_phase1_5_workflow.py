@@ -6,9 +6,9 @@ Tests the integrated ghost mannequin pipeline with all custom nodes.
 
 import json
 import requests
-import time
 import os
 from pathlib import Path
+from _comfyui import ComfyClient, json_loads
 
 # Configuration
 COMFYUI_SERVER = "http://127.0.0.1:8188"
@@ -16,11 +16,14 @@ WORKFLOW_FILE = "workflows/user_upload_workflow.json" # Test user upload workflo
 TEST_IMAGE = "input/test_garment.jpg"
 TEST_FACTS = "input/test_garment_facts.json"
 
+# Shared pooled client for every ComfyUI request
+CLIENT = ComfyClient(COMFYUI_SERVER)
+
 def load_workflow(workflow_path):
     """Load workflow from JSON file."""
     try:
-        with open(workflow_path, 'r') as f:
-            return json.load(f)
+        with open(workflow_path, 'rb') as f:
+            return json_loads(f.read())
     except FileNotFoundError:
         print(f"❌ Workflow file not found: {workflow_path}")
         return None
@@ -28,39 +31,6 @@ def load_workflow(workflow_path):
         print(f"❌ Invalid JSON in workflow file: {e}")
         return None
 
-def queue_prompt(workflow):
-    """Queue a prompt to ComfyUI."""
-    try:
-        response = requests.post(f"{COMFYUI_SERVER}/prompt", json={"prompt": workflow})
-        if response.status_code == 200:
-            result = response.json()
-            return result.get("prompt_id")
-        else:
-            print(f"❌ Failed to queue prompt: {response.status_code} - {response.text}")
-            return None
-    except requests.exceptions.ConnectionError:
-        print("❌ Cannot connect to ComfyUI server. Is it running on port 8188?")
-        return None
-
-def get_history(prompt_id):
-    """Get execution history for a prompt."""
-    try:
-        response = requests.get(f"{COMFYUI_SERVER}/history/{prompt_id}")
-        if response.status_code == 200:
-            return response.json()
-        else:
-            return None
-    except:
-        return None
-
-def check_comfyui_status():
-    """Check if ComfyUI server is running."""
-    try:
-        response = requests.get(f"{COMFYUI_SERVER}/system_stats")
-        return response.status_code == 200
-    except:
-        return False
-
 def test_workflow_components():
     """Test individual workflow components."""
     print("🔍 Testing Phase 1.5 Workflow Components...")
@@ -94,7 +64,7 @@ def main():
     print("=" * 50)
     
     # Check ComfyUI status
-    if not check_comfyui_status():
+    if CLIENT.system_stats() is None:
         print("❌ ComfyUI server is not running or not accessible")
         print("   Please start ComfyUI with: cd ComfyUI && python main.py --listen --port 8188")
         return False
@@ -123,51 +93,36 @@ def main():
     
     print("✅ Test input files present")
     
-    # Queue the prompt
-    print("📤 Queuing Phase 1.5 workflow...")
-    prompt_id = queue_prompt(workflow)
+    print("📤 Queuing Phase 1.5 workflow and waiting for execution...")
+    max_wait_time = 300  # 5 minutes
+    try:
+        prompt_id, success, error = CLIENT.run(workflow, max_wait_time)
+    except requests.RequestException as e:
+        print(f"❌ Failed to queue prompt: {e}")
+        return False
+    except TimeoutError:
+        print("⏰ Timeout waiting for workflow execution")
+        return False
     
-    if not prompt_id:
+    print(f"   Prompt ID: {prompt_id}")
+    
+    if not success:
+        print("❌ Workflow execution failed!")
+        print(f"   Error: {error}")
         return False
     
-    print(f"✅ Prompt queued with ID: {prompt_id}")
-    print("⏳ Waiting for execution...")
+    print("✅ Workflow executed successfully!")
     
-    # Monitor execution
-    max_wait_time = 300  # 5 minutes
-    start_time = time.time()
-    
-    while time.time() - start_time < max_wait_time:
-        history = get_history(prompt_id)
-        
-        if history and prompt_id in history:
-            prompt_data = history[prompt_id]
-            
-            if "status" in prompt_data:
-                status = prompt_data["status"]
-                if status.get("status_str") == "success":
-                    print("✅ Workflow executed successfully!")
-                    
-                    # Check outputs
-                    outputs = status.get("outputs", {})
-                    if outputs:
-                        print("📊 Generated outputs:")
-                        for node_id, output_data in outputs.items():
-                            if "images" in output_data:
-                                for img_info in output_data["images"]:
-                                    print(f"   - {img_info.get('filename', 'unknown')}")
-                    
-                    return True
-                elif status.get("status_str") == "error":
-                    print("❌ Workflow execution failed!")
-                    if "error" in status:
-                        print(f"   Error: {status['error']}")
-                    return False
-        
-        time.sleep(2)
-    
-    print("⏰ Timeout waiting for workflow execution")
-    return False
+    # Check outputs with a single history fetch
+    outputs = CLIENT.history(prompt_id).get("outputs", {})
+    if outputs:
+        print("📊 Generated outputs:")
+        for node_id, output_data in outputs.items():
+            if "images" in output_data:
+                for img_info in output_data["images"]:
+                    print(f"   - {img_info.get('filename', 'unknown')}")
+    
+    return True
 
 if __name__ == "__main__":
     success = main()
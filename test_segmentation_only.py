@@ -6,35 +6,62 @@ Tests the segmentation and analysis components without generation
 
 import sys
 import os
-import json
-import requests
+import functools
+import socket
 import time
+import unittest
+import requests
+from _comfyui import ComfyClient, json_loads
+
+# Shared pooled client for every ComfyUI request
+CLIENT = ComfyClient("http://127.0.0.1:8188")
+
+def _comfyui_up():
+    """Check that something is listening on ComfyUI's port, without an HTTP round trip"""
+    try:
+        socket.create_connection(("127.0.0.1", 8188), timeout=0.2).close()
+    except OSError:
+        return False
+    return True
+
+# Probed once at import so a run without ComfyUI skips instantly
+COMFYUI_UP = _comfyui_up()
 
+@functools.lru_cache(maxsize=1)
+def _load_workflow(path: str) -> dict:
+    """Parse the workflow file once; it is queued as-is and never patched"""
+    with open(path, 'rb') as f:
+        return json_loads(f.read())
+
+def _progress_printer(min_interval=1.0):
+    """Return an on_progress callback that redraws the progress line at most once per min_interval"""
+    last_print = 0.0
+    
+    def on_progress(value, total):
+        nonlocal last_print
+        now = time.monotonic()
+        if value == total or now - last_print >= min_interval:
+            sys.stdout.write(f"⏳ Progress: {value}/{total}\r")
+            sys.stdout.flush()
+            last_print = now
+    
+    return on_progress
+
+@unittest.skipUnless(COMFYUI_UP, "ComfyUI not running")
 def test_segmentation_workflow():
     """Test the segmentation workflow"""
     print("🚀 Testing Phase 2 Segmentation Components...")
     
-    # Check if ComfyUI is running
-    try:
-        response = requests.get("http://127.0.0.1:8188/system_stats", timeout=5)
-        if response.status_code != 200:
-            print("❌ ComfyUI not running. Start with: cd ComfyUI && python main.py")
-            return False
-    except requests.exceptions.RequestException:
-        print("❌ ComfyUI not running. Start with: cd ComfyUI && python main.py")
-        return False
-    
     print("✅ ComfyUI is running")
     
     # Load workflow
     workflow_path = "workflows/phase2_segmentation_test.json"
-    if not os.path.exists(workflow_path):
+    try:
+        workflow = _load_workflow(workflow_path)
+    except FileNotFoundError:
         print(f"❌ Workflow not found: {workflow_path}")
         return False
     
-    with open(workflow_path, 'r') as f:
-        workflow = json.load(f)
-    
     print(f"✅ Loaded workflow with {len(workflow)} nodes")
     
     # Check required input files
@@ -49,95 +76,48 @@ def test_segmentation_workflow():
             return False
         print(f"✅ Found: {file_path}")
     
-    # Queue the workflow
+    # Queue the workflow and wait on its event stream
+    max_wait = 180  # 3 minutes for segmentation only
     try:
-        print("📤 Queuing segmentation workflow...")
-        response = requests.post(
-            "http://127.0.0.1:8188/prompt",
-            json={
-                "prompt": workflow,
-                "client_id": "test_segmentation_only"
-            },
-            timeout=30
-        )
+        print("📤 Queuing segmentation workflow and monitoring execution...")
+        try:
+            prompt_id, success, error = CLIENT.run(
+                workflow, max_wait, on_progress=_progress_printer()
+            )
+        except requests.HTTPError as e:
+            print(f"❌ Failed to queue workflow: {e}")
+            return False
+        except TimeoutError:
+            print(f"\n⏰ Timeout after {max_wait} seconds")
+            return False
+        print(f"   Prompt ID: {prompt_id}")
         
-        if response.status_code != 200:
-            print(f"❌ Failed to queue workflow: {response.status_code}")
-            print(f"Response: {response.text}")
+        if not success:
+            print("❌ Workflow failed!")
+            print(f"Error: {error}")
             return False
         
-        result = response.json()
-        prompt_id = result.get("prompt_id")
-        print(f"✅ Workflow queued with ID: {prompt_id}")
+        print("✅ Segmentation workflow completed successfully!")
         
-        # Monitor execution
-        print("⏳ Monitoring execution...")
-        start_time = time.time()
-        max_wait = 180  # 3 minutes for segmentation only
+        # Check for output images
+        outputs = CLIENT.history(prompt_id).get("outputs", {})
         
-        while time.time() - start_time < max_wait:
-            try:
-                # Check prompt status
-                status_response = requests.get(
-                    f"http://127.0.0.1:8188/prompt/{prompt_id}",
-                    timeout=10
-                )
-                
-                if status_response.status_code == 200:
-                    status_data = status_response.json()
-                    status = status_data.get("status", {})
-                    
-                    if status.get("status_str") == "success":
-                        print("✅ Segmentation workflow completed successfully!")
-                        
-                        # Check for output images
-                        history_response = requests.get(
-                            f"http://127.0.0.1:8188/history/{prompt_id}",
-                            timeout=10
-                        )
-                        
-                        if history_response.status_code == 200:
-                            history_data = history_response.json()
-                            outputs = history_data.get("outputs", {})
-                            
-                            # Check for segmentation outputs
-                            if "6" in outputs:  # Garment segmentation
-                                images = outputs["6"].get("images", [])
-                                if images:
-                                    print(f"✅ Generated {len(images)} segmentation images")
-                                    for img in images:
-                                        print(f"   - {img.get('filename', 'unknown')}")
-                            
-                            if "7" in outputs:  # Parts overlay
-                                images = outputs["7"].get("images", [])
-                                if images:
-                                    print(f"✅ Generated {len(images)} parts overlay images")
-                                    for img in images:
-                                        print(f"   - {img.get('filename', 'unknown')}")
-                            
-                            return True
-                        
-                        return True
-                    
-                    elif status.get("status_str") == "error":
-                        print("❌ Workflow failed!")
-                        error = status.get("error", {})
-                        print(f"Error: {error}")
-                        return False
-                    
-                    else:
-                        # Still running
-                        progress = status.get("progress", 0)
-                        print(f"⏳ Progress: {progress}%", end='\r')
-                
-                time.sleep(2)
-                
-            except requests.exceptions.RequestException as e:
-                print(f"⚠️  Request error: {e}")
-                time.sleep(2)
+        # Check for segmentation outputs
+        if "6" in outputs:  # Garment segmentation
+            images = outputs["6"].get("images", [])
+            if images:
+                print(f"✅ Generated {len(images)} segmentation images")
+                for img in images:
+                    print(f"   - {img.get('filename', 'unknown')}")
         
-        print(f"\n⏰ Timeout after {max_wait} seconds")
-        return False
+        if "7" in outputs:  # Parts overlay
+            images = outputs["7"].get("images", [])
+            if images:
+                print(f"✅ Generated {len(images)} parts overlay images")
+                for img in images:
+                    print(f"   - {img.get('filename', 'unknown')}")
+        
+        return True
         
     except Exception as e:
         print(f"❌ Workflow test failed: {e}")
@@ -150,6 +130,10 @@ def main():
     print("🧪 Phase 2 Segmentation Test")
     print("=" * 40)
     
+    if not COMFYUI_UP:
+        print("❌ ComfyUI not running. Start with: cd ComfyUI && python main.py")
+        return False
+    
     # Test workflow
     success = test_segmentation_workflow()
     
@@ -1,6 +1,9 @@
 """
 Unit tests for mask quality scoring in Phase 2.1
 Tests edge alignment, entropy, and morphological stability metrics
+
+Usage:
+    python -m pytest tests/test_mask_quality.py tests/test_mask_quality_edge_cases.py -v
 """
 
 import unittest
@@ -16,42 +19,49 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'ComfyUI', 'custom
 
 from advanced_garment_segmentation import AdvancedGarmentSegmentation
 
+# Fixed noise for the poor-quality mask; seeded so its thresholds never flake
+_NOISE = np.random.default_rng(0).integers(0, 50, (100, 100), dtype=np.uint8)
+_NOISE.flags.writeable = False
+
 
 class TestMaskQuality(unittest.TestCase):
     """Test mask quality scoring functionality"""
     
-    def setUp(self):
-        """Set up test fixtures"""
-        self.segmentation = AdvancedGarmentSegmentation()
+    @classmethod
+    def setUpClass(cls):
+        """Build the segmentation node and fixtures once; no test mutates them"""
+        cls.segmentation = AdvancedGarmentSegmentation()
         
         # Create test images and masks
-        self.test_image = self._create_test_image()
-        self.test_mask = self._create_test_mask()
-        self.test_mask_poor = self._create_poor_quality_mask()
+        cls.test_image = cls._create_test_image()
+        cls.test_mask = cls._create_test_mask()
+        cls.test_mask_poor = cls._create_poor_quality_mask()
     
-    def _create_test_image(self):
+    @staticmethod
+    def _create_test_image():
         """Create a test image with clear edges"""
         # Create a 100x100 image with a centered rectangle
         image = np.zeros((100, 100, 3), dtype=np.uint8)
         image[25:75, 25:75] = [255, 255, 255]  # White rectangle
         return Image.fromarray(image)
     
-    def _create_test_mask(self):
+    @staticmethod
+    def _create_test_mask():
         """Create a high-quality mask"""
         # Create a clean mask matching the test image
         mask = np.zeros((100, 100), dtype=np.uint8)
         mask[25:75, 25:75] = 255  # White rectangle
         return Image.fromarray(mask, mode='L')
     
-    def _create_poor_quality_mask(self):
+    @staticmethod
+    def _create_poor_quality_mask():
         """Create a poor-quality mask with noise and blur"""
         # Create a noisy, blurred mask
         mask = np.zeros((100, 100), dtype=np.uint8)
         mask[25:75, 25:75] = 255  # Base rectangle
         
-        # Add noise
-        noise = np.random.randint(0, 50, (100, 100), dtype=np.uint8)
-        mask = np.clip(mask.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+        # Add noise; cv2.add saturates at 255 without an int16 round-trip
+        mask = cv2.add(mask, _NOISE)
         
         # Blur the mask
         mask = cv2.GaussianBlur(mask, (5, 5), 0)
@@ -157,103 +167,24 @@ class TestMaskQuality(unittest.TestCase):
     
     def test_mask_quality_consistency(self):
         """Test that mask quality computation is consistent"""
-        # Run the same computation multiple times
-        results = []
+        # Score with a fresh node as the reference, then repeat on the shared
+        # node, so state carried between calls or instances also shows up
+        reference = AdvancedGarmentSegmentation()._compute_mask_quality(
+            self.test_mask, self.test_mask, self.test_mask, self.test_image
+        )
+        
         for _ in range(5):
             confidence, quality_metrics = self.segmentation._compute_mask_quality(
                 self.test_mask, self.test_mask, self.test_mask, self.test_image
             )
-            results.append((confidence, quality_metrics["mask_quality_score"]))
-        
-        # Results should be consistent (within small tolerance for floating point)
-        confidences = [r[0] for r in results]
-        quality_scores = [r[1] for r in results]
-        
-        self.assertAlmostEqual(max(confidences), min(confidences), places=3,
-                              msg="Confidence scores should be consistent")
-        self.assertAlmostEqual(max(quality_scores), min(quality_scores), places=3,
-                              msg="Quality scores should be consistent")
-
-
-class TestMaskQualityEdgeCases(unittest.TestCase):
-    """Test edge cases for mask quality scoring"""
-    
-    def setUp(self):
-        self.segmentation = AdvancedGarmentSegmentation()
-    
-    def test_empty_mask(self):
-        """Test with completely empty mask"""
-        empty_mask = Image.new('L', (100, 100), 0)
-        test_image = Image.new('RGB', (100, 100), (255, 255, 255))
-        
-        edge_score = self.segmentation._compute_edge_alignment(empty_mask, test_image)
-        self.assertEqual(edge_score, 0.0, "Empty mask should have zero edge alignment")
-        
-        entropy_score = self.segmentation._compute_mask_entropy(empty_mask)
-        self.assertGreaterEqual(entropy_score, 0.0)
-        
-        stability_score = self.segmentation._compute_morphological_stability(empty_mask)
-        self.assertGreaterEqual(stability_score, 0.0)
-    
-    def test_full_mask(self):
-        """Test with completely filled mask"""
-        full_mask = Image.new('L', (100, 100), 255)
-        test_image = Image.new('RGB', (100, 100), (255, 255, 255))
-        
-        edge_score = self.segmentation._compute_edge_alignment(full_mask, test_image)
-        self.assertGreaterEqual(edge_score, 0.0)
-        
-        entropy_score = self.segmentation._compute_mask_entropy(full_mask)
-        self.assertGreaterEqual(entropy_score, 0.0)
-        
-        stability_score = self.segmentation._compute_morphological_stability(full_mask)
-        self.assertGreaterEqual(stability_score, 0.0)
-    
-    def test_single_pixel_mask(self):
-        """Test with single pixel mask"""
-        single_pixel_mask = Image.new('L', (100, 100), 0)
-        single_pixel_mask.putpixel((50, 50), 255)
-        test_image = Image.new('RGB', (100, 100), (255, 255, 255))
-        
-        # Should not crash
-        edge_score = self.segmentation._compute_edge_alignment(single_pixel_mask, test_image)
-        self.assertGreaterEqual(edge_score, 0.0)
-        
-        entropy_score = self.segmentation._compute_mask_entropy(single_pixel_mask)
-        self.assertGreaterEqual(entropy_score, 0.0)
-        
-        stability_score = self.segmentation._compute_morphological_stability(single_pixel_mask)
-        self.assertGreaterEqual(stability_score, 0.0)
-
+            
+            # Results should be consistent (within small tolerance for floating point)
+            self.assertAlmostEqual(confidence, reference[0], places=3,
+                                  msg="Confidence scores should be consistent")
+            self.assertAlmostEqual(quality_metrics["mask_quality_score"],
+                                  reference[1]["mask_quality_score"], places=3,
+                                  msg="Quality scores should be consistent")
 
 if __name__ == '__main__':
-    # Create test suite
-    test_suite = unittest.TestSuite()
-    
-    # Add test cases
-    test_suite.addTest(unittest.makeSuite(TestMaskQuality))
-    test_suite.addTest(unittest.makeSuite(TestMaskQualityEdgeCases))
-    
-    # Run tests
-    runner = unittest.TextTestRunner(verbosity=2)
-    result = runner.run(test_suite)
-    
-    # Print summary
-    print(f"\nTest Summary:")
-    print(f"Tests run: {result.testsRun}")
-    print(f"Failures: {len(result.failures)}")
-    print(f"Errors: {len(result.errors)}")
-    
-    if result.failures:
-        print("\nFailures:")
-        for test, traceback in result.failures:
-            print(f"  {test}: {traceback}")
-    
-    if result.errors:
-        print("\nErrors:")
-        for test, traceback in result.errors:
-            print(f"  {test}: {traceback}")
-    
-    # Exit with appropriate code
-    exit_code = 0 if result.wasSuccessful() else 1
-    exit(exit_code)
+    # unittest's own runner reports failures and errors and sets the exit code
+    unittest.main(verbosity=2)
@@ -0,0 +1,72 @@
+"""
+Edge-case tests for mask quality scoring in Phase 2.1
+Empty, full and single-pixel masks; kept apart from test_mask_quality.py so
+the two suites can run on separate workers (e.g. pytest -n 2)
+"""
+
+import unittest
+from PIL import Image
+import sys
+import os
+
+# Add the ComfyUI custom_nodes directory to the path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'ComfyUI', 'custom_nodes'))
+
+from advanced_garment_segmentation import AdvancedGarmentSegmentation
+
+
+class TestMaskQualityEdgeCases(unittest.TestCase):
+    """Test edge cases for mask quality scoring"""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.segmentation = AdvancedGarmentSegmentation()
+    
+    def test_empty_mask(self):
+        """Test with completely empty mask"""
+        empty_mask = Image.new('L', (100, 100), 0)
+        test_image = Image.new('RGB', (100, 100), (255, 255, 255))
+        
+        edge_score = self.segmentation._compute_edge_alignment(empty_mask, test_image)
+        self.assertEqual(edge_score, 0.0, "Empty mask should have zero edge alignment")
+        
+        entropy_score = self.segmentation._compute_mask_entropy(empty_mask)
+        self.assertGreaterEqual(entropy_score, 0.0)
+        
+        stability_score = self.segmentation._compute_morphological_stability(empty_mask)
+        self.assertGreaterEqual(stability_score, 0.0)
+    
+    def test_full_mask(self):
+        """Test with completely filled mask"""
+        full_mask = Image.new('L', (100, 100), 255)
+        test_image = Image.new('RGB', (100, 100), (255, 255, 255))
+        
+        edge_score = self.segmentation._compute_edge_alignment(full_mask, test_image)
+        self.assertGreaterEqual(edge_score, 0.0)
+        
+        entropy_score = self.segmentation._compute_mask_entropy(full_mask)
+        self.assertGreaterEqual(entropy_score, 0.0)
+        
+        stability_score = self.segmentation._compute_morphological_stability(full_mask)
+        self.assertGreaterEqual(stability_score, 0.0)
+    
+    def test_single_pixel_mask(self):
+        """Test with single pixel mask"""
+        single_pixel_mask = Image.new('L', (100, 100), 0)
+        single_pixel_mask.putpixel((50, 50), 255)
+        test_image = Image.new('RGB', (100, 100), (255, 255, 255))
+        
+        # Should not crash
+        edge_score = self.segmentation._compute_edge_alignment(single_pixel_mask, test_image)
+        self.assertGreaterEqual(edge_score, 0.0)
+        
+        entropy_score = self.segmentation._compute_mask_entropy(single_pixel_mask)
+        self.assertGreaterEqual(entropy_score, 0.0)
+        
+        stability_score = self.segmentation._compute_morphological_stability(single_pixel_mask)
+        self.assertGreaterEqual(stability_score, 0.0)
+
+
+if __name__ == '__main__':
+    # unittest's own runner reports failures and errors and sets the exit code
+    unittest.main(verbosity=2)
@@ -11,8 +11,21 @@ import torch
 import sys
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import Mock, patch
 
+# Prefer the C-backed orjson codec when it is installed; the nodes take str JSON
+try:
+    import orjson
+    json_loads = orjson.loads
+    
+    def json_dumps(obj):
+        return orjson.dumps(obj).decode('utf-8')
+except ImportError:
+    json_loads = json.loads
+    json_dumps = json.dumps
+
 # Add the ComfyUI custom_nodes directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'ComfyUI', 'custom_nodes'))
 
@@ -21,26 +34,66 @@ from advanced_garment_segmentation import AdvancedGarmentSegmentation
 from semantic_qa_node import SemanticQANode
 from garment_part_segmentation import GarmentPartSegmentation
 
+# Canned Gemini reply for the class-scoped stub; mirrors test_semantic_qa.py
+_GEMINI_RESPONSE = json_dumps({
+    "category": "dress_shirt",
+    "color_hex": "#6496C8",
+    "pattern": "solid",
+    "key_features": ["collar", "sleeves", "buttons"],
+    "quality_score": 0.8,
+    "completeness": 0.9,
+    "notes": "Clean blue dress shirt"
+})
+
+
+def _deep_update(base, overrides):
+    """Merge overrides into base in place, recursing into nested dicts"""
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            _deep_update(base[key], value)
+        else:
+            base[key] = value
+    return base
+
 
 class TestPhase21Integration(unittest.TestCase):
     """Test Phase 2.1 integration"""
     
-    def setUp(self):
-        """Set up test fixtures"""
-        self.pre_analysis = PreAnalysisNode()
-        self.segmentation = AdvancedGarmentSegmentation()
-        self.semantic_qa = SemanticQANode()
-        self.part_segmentation = GarmentPartSegmentation()
+    @classmethod
+    def setUpClass(cls):
+        """Load the nodes (and their models) and the read-only fixtures once"""
+        cls.pre_analysis = PreAnalysisNode()
+        cls.segmentation = AdvancedGarmentSegmentation()
+        cls.semantic_qa = SemanticQANode()
+        cls.part_segmentation = GarmentPartSegmentation()
+        
+        # Answer Gemini from a canned reply so the suite is hermetic and the
+        # tests exercise the node's glue code rather than the remote API
+        gemini_model = Mock()
+        gemini_model.generate_content.return_value = Mock(text=_GEMINI_RESPONSE)
+        # create=True: without a Gemini key the node never sets these
+        # attributes, and the stub must apply either way
+        cls._patches = [
+            patch('semantic_qa_node.genai', create=True),
+            patch.multiple(cls.semantic_qa, gemini_available=True, model=gemini_model,
+                           create=True),
+        ]
+        for patcher in cls._patches:
+            patcher.start()
         
         # Create test image
-        self.test_image = self._create_test_garment_image()
-        self.test_image_tensor = self._pil_to_tensor(self.test_image)
-        
-        # Create test facts
-        self.test_facts = self._create_test_facts()
-        self.test_facts_json = json.dumps(self.test_facts)
+        cls.test_image = cls._create_test_garment_image()
+        cls.test_image_tensor = cls._pil_to_tensor(cls.test_image)
+        cls.test_facts_json = json_dumps(cls._create_test_facts())
     
-    def _create_test_garment_image(self):
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the Gemini stub"""
+        for patcher in reversed(cls._patches):
+            patcher.stop()
+    
+    @staticmethod
+    def _create_test_garment_image():
         """Create a realistic test garment image"""
         # Create a 400x600 image (4:5 aspect ratio)
         image = np.full((600, 400, 3), [240, 240, 240], dtype=np.uint8)  # Light gray background
@@ -56,13 +109,15 @@ class TestPhase21Integration(unittest.TestCase):
         image[120:200, 120:150] = [100, 150, 200]  # Left sleeve
         image[120:200, 250:280] = [100, 150, 200]  # Right sleeve
         
-        # Add some texture/noise to make it more realistic
-        noise = np.random.randint(-10, 10, image.shape, dtype=np.int16)
-        image = np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+        # Add some texture/noise to make it more realistic; seeded so the
+        # fixture is identical every run, and cv2.add saturates to [0, 255]
+        noise = np.random.default_rng(0).integers(-10, 10, image.shape, dtype=np.int8)
+        image = cv2.add(image, noise, dtype=cv2.CV_8U)
         
         return Image.fromarray(image)
     
-    def _create_test_facts(self):
+    @staticmethod
+    def _create_test_facts():
         """Create comprehensive test Facts V3.1 data"""
         return {
             "schema_version": "3.1",
@@ -129,10 +184,16 @@ class TestPhase21Integration(unittest.TestCase):
             "risk_score": 0.2
         }
     
-    def _pil_to_tensor(self, image):
+    def _facts(self, **overrides):
+        """Return a fresh Facts V3.1 dict with overrides merged in"""
+        return _deep_update(self._create_test_facts(), overrides)
+    
+    @staticmethod
+    def _pil_to_tensor(image):
         """Convert PIL image to ComfyUI tensor format"""
-        image_np = np.array(image).astype(np.float32) / 255.0
-        return torch.from_numpy(image_np)[None,]
+        # Cast once in torch and divide in place; np.array (not asarray) keeps
+        # the uint8 buffer writable so torch.from_numpy does not warn
+        return torch.from_numpy(np.array(image)).unsqueeze(0).to(torch.float32).div_(255.0)
     
     def test_pre_analysis_pipeline(self):
         """Test pre-analysis feature extraction"""
@@ -142,7 +203,7 @@ class TestPhase21Integration(unittest.TestCase):
         )
         
         # Parse results
-        pre_features = json.loads(pre_features_json)
+        pre_features = json_loads(pre_features_json)
         
         # Verify all required features are present
         required_features = [
@@ -197,7 +258,7 @@ class TestPhase21Integration(unittest.TestCase):
                             "Confidence should not exceed 1.0")
         
         # Parse quality metrics
-        quality_metrics = json.loads(quality_metrics_json)
+        quality_metrics = json_loads(quality_metrics_json)
         
         # Verify quality metrics structure
         required_metrics = [
@@ -226,8 +287,7 @@ class TestPhase21Integration(unittest.TestCase):
     def test_dynamic_prompts_generation(self):
         """Test dynamic prompts generation from Facts V3.1"""
         # Test with high interior visibility
-        facts_high_visibility = self.test_facts.copy()
-        facts_high_visibility["interior_visibility"] = {"level": "high"}
+        facts_high_visibility = self._facts(interior_visibility={"level": "high"})
         
         parts_list = self.part_segmentation._build_dynamic_prompts(facts_high_visibility)
         
@@ -243,8 +303,7 @@ class TestPhase21Integration(unittest.TestCase):
                          f"Should include {part} in dynamic prompts")
         
         # Test with high complexity
-        facts_high_complexity = self.test_facts.copy()
-        facts_high_complexity["garment"]["complexity_score"] = 0.8
+        facts_high_complexity = self._facts(garment={"complexity_score": 0.8})
         
         parts_list = self.part_segmentation._build_dynamic_prompts(facts_high_complexity)
         
@@ -285,8 +344,8 @@ class TestPhase21Integration(unittest.TestCase):
                              "Should re-render should be a boolean")
         
         # Parse JSON outputs
-        gemini_facts = json.loads(gemini_facts_json)
-        qa_report = json.loads(qa_report_json)
+        gemini_facts = json_loads(gemini_facts_json)
+        qa_report = json_loads(qa_report_json)
         
         # Verify gemini facts structure
         self.assertIn("category", gemini_facts)
@@ -301,40 +360,51 @@ class TestPhase21Integration(unittest.TestCase):
     
     def test_complete_pipeline_integration(self):
         """Test the complete Phase 2.1 pipeline integration"""
-        # Step 1: Pre-analysis
-        pre_features_json, debug_image = self.pre_analysis.analyze(
-            self.test_image_tensor, n_color_clusters=5, pattern_threshold=0.3, enable_ocr=True
-        )
-        pre_features = json.loads(pre_features_json)
-        
-        # Step 2: Advanced segmentation with quality scoring
-        garment_only, garment_mask, confidence, quality_metrics_json = \
-            self.segmentation.segment_garment(
-                self.test_image_tensor, rmbg_threshold=0.32, u2net_threshold=0.35,
-                use_human_subtract=True, mask_blur=3, edge_feather=4
-            )
-        quality_metrics = json.loads(quality_metrics_json)
-        
-        # Step 3: Dynamic prompts generation
-        parts_list = self.part_segmentation._build_dynamic_prompts(self.test_facts)
-        
-        # Step 4: Part segmentation (simplified test)
-        # Note: This would normally use GroundingDINO + SAM2, but we'll test the interface
-        self.assertIsInstance(parts_list, list)
-        self.assertGreater(len(parts_list), 0)
-        
-        # Step 5: Semantic QA (simulate with a slightly modified image)
+        # Semantic QA input (simulate with a slightly modified image)
         rendered_image = self.test_image.copy()
         rendered_array = np.array(rendered_image)
         rendered_array[100:200, 150:250] = [110, 160, 210]  # Slightly different
         rendered_image = Image.fromarray(rendered_array)
         rendered_tensor = self._pil_to_tensor(rendered_image)
         
-        semantic_alignment, gemini_facts_json, qa_report_json, should_rerender = \
-            self.semantic_qa.verify_alignment(
+        # Pre-analysis, segmentation and semantic QA share no data, so they
+        # run concurrently; the nodes' NumPy/OpenCV/torch work releases the GIL
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            # Step 1: Pre-analysis
+            pre_future = executor.submit(
+                self.pre_analysis.analyze,
+                self.test_image_tensor, n_color_clusters=5, pattern_threshold=0.3, enable_ocr=True
+            )
+            
+            # Step 2: Advanced segmentation with quality scoring
+            seg_future = executor.submit(
+                self.segmentation.segment_garment,
+                self.test_image_tensor, rmbg_threshold=0.32, u2net_threshold=0.35,
+                use_human_subtract=True, mask_blur=3, edge_feather=4
+            )
+            
+            # Step 3: Semantic QA
+            qa_future = executor.submit(
+                self.semantic_qa.verify_alignment,
                 rendered_tensor, self.test_facts_json,
                 alignment_threshold=0.9, enable_auto_rerender=True
             )
+            
+            # Step 4: Dynamic prompts generation
+            parts_list = self.part_segmentation._build_dynamic_prompts(self._facts())
+            
+            # Step 5: Part segmentation (simplified test)
+            # Note: This would normally use GroundingDINO + SAM2, but we'll test the interface
+            self.assertIsInstance(parts_list, list)
+            self.assertGreater(len(parts_list), 0)
+            
+            pre_features_json, debug_image = pre_future.result()
+            garment_only, garment_mask, confidence, quality_metrics_json = seg_future.result()
+            semantic_alignment, gemini_facts_json, qa_report_json, should_rerender = \
+                qa_future.result()
+        
+        pre_features = json_loads(pre_features_json)
+        quality_metrics = json_loads(quality_metrics_json)
         
         # Verify pipeline integration
         self.assertIsInstance(pre_features, dict)
@@ -365,13 +435,13 @@ class TestPhase21Integration(unittest.TestCase):
     def test_error_handling_integration(self):
         """Test error handling across the pipeline"""
         # Test with invalid image
-        invalid_tensor = torch.randn(1, 3, 10, 10)  # Random tensor
+        invalid_tensor = torch.zeros(1, 10, 10, 3, dtype=torch.float32)  # Blank, too small to segment
         
         # Pre-analysis should handle gracefully
         pre_features_json, debug_image = self.pre_analysis.analyze(
             invalid_tensor, n_color_clusters=3, pattern_threshold=0.3, enable_ocr=False
         )
-        pre_features = json.loads(pre_features_json)
+        pre_features = json_loads(pre_features_json)
         self.assertIn("dominant_colors", pre_features)
         
         # Segmentation should handle gracefully
@@ -392,34 +462,42 @@ class TestPhase21Integration(unittest.TestCase):
         self.assertIsInstance(semantic_alignment, float)
         self.assertGreaterEqual(semantic_alignment, 0.0)
     
+    @staticmethod
+    def _bench(fn, warmup=1, iters=3):
+        """Return fn's mean wall time in seconds over iters runs after warmup runs
+        
+        The warm-up absorbs lazy model loads and CUDA/cuDNN initialisation;
+        the GPU is synchronized so queued kernels are counted.
+        """
+        for _ in range(warmup):
+            fn()
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        for _ in range(iters):
+            fn()
+        if torch.cuda.is_available():
+            torch.cuda.synchronize()
+        return (time.perf_counter() - start) / iters
+    
     def test_performance_benchmarks(self):
         """Test performance characteristics of the pipeline"""
-        import time
-        
         # Benchmark pre-analysis
-        start_time = time.time()
-        pre_features_json, debug_image = self.pre_analysis.analyze(
+        pre_analysis_time = self._bench(lambda: self.pre_analysis.analyze(
             self.test_image_tensor, n_color_clusters=5, pattern_threshold=0.3, enable_ocr=False
-        )
-        pre_analysis_time = time.time() - start_time
+        ))
         
         # Benchmark segmentation
-        start_time = time.time()
-        garment_only, garment_mask, confidence, quality_metrics_json = \
-            self.segmentation.segment_garment(
-                self.test_image_tensor, rmbg_threshold=0.32, u2net_threshold=0.35,
-                use_human_subtract=True, mask_blur=3, edge_feather=4
-            )
-        segmentation_time = time.time() - start_time
+        segmentation_time = self._bench(lambda: self.segmentation.segment_garment(
+            self.test_image_tensor, rmbg_threshold=0.32, u2net_threshold=0.35,
+            use_human_subtract=True, mask_blur=3, edge_feather=4
+        ))
         
         # Benchmark semantic QA
-        start_time = time.time()
-        semantic_alignment, gemini_facts_json, qa_report_json, should_rerender = \
-            self.semantic_qa.verify_alignment(
-                self.test_image_tensor, self.test_facts_json,
-                alignment_threshold=0.9, enable_auto_rerender=True
-            )
-        semantic_qa_time = time.time() - start_time
+        semantic_qa_time = self._bench(lambda: self.semantic_qa.verify_alignment(
+            self.test_image_tensor, self.test_facts_json,
+            alignment_threshold=0.9, enable_auto_rerender=True
+        ))
         
         # Verify reasonable performance (adjust thresholds as needed)
         self.assertLess(pre_analysis_time, 5.0, "Pre-analysis should complete within 5 seconds")
@@ -433,12 +511,35 @@ class TestPhase21Integration(unittest.TestCase):
         print(f"  Total: {pre_analysis_time + segmentation_time + semantic_qa_time:.2f}s")
 
 
+@unittest.skipUnless(os.getenv("RUN_LIVE_GEMINI"), "set RUN_LIVE_GEMINI=1 to call the real Gemini API")
+class TestPhase21LiveGemini(unittest.TestCase):
+    """Smoke test semantic QA against the real Gemini API"""
+    
+    def test_semantic_qa_live(self):
+        """Test verify_alignment end to end without the Gemini stub"""
+        image_tensor = TestPhase21Integration._pil_to_tensor(
+            TestPhase21Integration._create_test_garment_image()
+        )
+        facts_json = json_dumps(TestPhase21Integration._create_test_facts())
+        
+        semantic_alignment, gemini_facts_json, qa_report_json, should_rerender = \
+            SemanticQANode().verify_alignment(
+                image_tensor, facts_json,
+                alignment_threshold=0.9, enable_auto_rerender=True
+            )
+        
+        self.assertGreaterEqual(semantic_alignment, 0.0)
+        self.assertLessEqual(semantic_alignment, 1.0)
+        self.assertIn("category", json_loads(gemini_facts_json))
+
+
 if __name__ == '__main__':
     # Create test suite
-    test_suite = unittest.TestSuite()
-    
-    # Add test cases
-    test_suite.addTest(unittest.makeSuite(TestPhase21Integration))
+    loader = unittest.TestLoader()
+    test_suite = unittest.TestSuite(
+        loader.loadTestsFromTestCase(case)
+        for case in (TestPhase21Integration, TestPhase21LiveGemini)
+    )
     
     # Run tests
     runner = unittest.TextTestRunner(verbosity=2)
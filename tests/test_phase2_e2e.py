@@ -7,8 +7,6 @@ Tests the complete pipeline with real components and QA metrics
 import sys
 import os
 import json
-import time
-import requests
 import numpy as np
 from PIL import Image
 import unittest
@@ -17,12 +15,19 @@ from typing import Dict, List, Tuple
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+from _comfyui import ComfyClient
+
+COMFYUI_URL = "http://localhost:8188"
+
+# Shared pooled client for every ComfyUI request
+CLIENT = ComfyClient(COMFYUI_URL)
+
 class TestPhase2E2E(unittest.TestCase):
     """End-to-end test for Phase 2 pipeline"""
     
     def setUp(self):
         """Set up test fixtures"""
-        self.comfyui_url = "http://localhost:8188"
+        self.comfyui_url = COMFYUI_URL
         self.test_image_path = "input/test_garment.jpg"
         self.test_facts_path = "input/test_garment_facts.json"
         self.workflow_path = "workflows/phase2_production.json"
@@ -38,12 +43,9 @@ class TestPhase2E2E(unittest.TestCase):
     
     def test_comfyui_server_availability(self):
         """Test if ComfyUI server is running"""
-        try:
-            response = requests.get(f"{self.comfyui_url}/system_stats", timeout=5)
-            self.assertEqual(response.status_code, 200)
-            print("✅ ComfyUI server is running")
-        except requests.exceptions.RequestException as e:
-            self.fail(f"ComfyUI server not available: {e}")
+        stats = CLIENT.system_stats()
+        self.assertIsNotNone(stats, f"ComfyUI server not available at {self.comfyui_url}")
+        print("✅ ComfyUI server is running")
     
     def test_workflow_loading(self):
         """Test if Phase 2 workflow can be loaded"""
@@ -81,13 +83,11 @@ class TestPhase2E2E(unittest.TestCase):
             # Update input paths in workflow
             self._update_workflow_inputs(workflow)
             
-            # Submit workflow
-            prompt_id = self._submit_workflow(workflow)
+            # Submit workflow and wait on the WebSocket for completion
+            prompt_id, success, error = CLIENT.run(workflow)
             self.assertIsNotNone(prompt_id)
-            
-            # Wait for completion
-            result = self._wait_for_completion(prompt_id)
-            self.assertIsNotNone(result)
+            self.assertTrue(success, f"Workflow failed: {error}")
+            self.assertTrue(CLIENT.history(prompt_id))
             
             print(f"✅ Workflow executed successfully: {prompt_id}")
             
@@ -154,44 +154,6 @@ class TestPhase2E2E(unittest.TestCase):
             elif node["type"] == "LoadFactsNode":
                 node["widgets_values"][0] = self.test_facts_path
     
-    def _submit_workflow(self, workflow: Dict) -> str:
-        """Submit workflow to ComfyUI"""
-        try:
-            response = requests.post(
-                f"{self.comfyui_url}/prompt",
-                json={"prompt": workflow},
-                timeout=30
-            )
-            response.raise_for_status()
-            result = response.json()
-            return result.get("prompt_id")
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"Failed to submit workflow: {e}")
-    
-    def _wait_for_completion(self, prompt_id: str, timeout: int = 300) -> Dict:
-        """Wait for workflow completion"""
-        start_time = time.time()
-        
-        while time.time() - start_time < timeout:
-            try:
-                response = requests.get(f"{self.comfyui_url}/history/{prompt_id}")
-                response.raise_for_status()
-                history = response.json()
-                
-                if prompt_id in history:
-                    status = history[prompt_id].get("status")
-                    if status.get("status_str") == "success":
-                        return history[prompt_id]
-                    elif status.get("status_str") == "error":
-                        raise Exception(f"Workflow failed: {status.get('messages', [])}")
-                
-                time.sleep(2)
-                
-            except requests.exceptions.RequestException as e:
-                raise Exception(f"Failed to check workflow status: {e}")
-        
-        raise Exception(f"Workflow timeout after {timeout} seconds")
-    
     def _calculate_qa_metrics(self, image: Image.Image) -> Dict[str, float]:
         """Calculate QA metrics for generated image"""
         # This is a simplified version - real implementation would use actual metrics